@@ -5,6 +5,10 @@ import sys
 
 
 def main():
+    # Тесты идут со своими настройками: общий кеш в памяти, без пула
+    # процессов для миниатюр.
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings_test')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
     try:
         from django.core.management import execute_from_command_line
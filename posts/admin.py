@@ -1,32 +1,123 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
 
-from .models import Comment, Group, Follow, Post
+from . import search
+from .models import Comment, Group, Follow, Post, User
+from .paginator import EstimatedCountPaginator
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех возможных значений."""
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        params = dict(changelist.params)
+        params.pop(self.parameter_name, None)
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]),
+            'display': _('All'),
+            'params': params,
+        }
+
+
+class UsernameFilter(InputFilter):
+    field = None
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(
+                **{f'{self.field}__username': self.value()})
+        return queryset
+
+
+class AuthorFilter(UsernameFilter):
+    title = 'автор'
+    parameter_name = field = 'author'
+
+
+class UserFilter(UsernameFilter):
+    title = 'подписчик'
+    parameter_name = field = 'user'
+
+
+class PostFilter(InputFilter):
+    title = 'номер поста'
+    parameter_name = 'post'
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(post_id=self.value())
+        return queryset
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class UsernameSearchAdmin(ScalableAdmin):
+    """Поиск по точному имени пользователя через уникальный индекс."""
+    username_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        ids = User.objects.filter(username=term).values('id')
+        condition = Q()
+        for field in self.username_fields:
+            condition |= Q(**{f'{field}_id__in': ids})
+        return queryset.filter(condition), False
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
+    search_fields = ('title',)
     empty_value_display = '-пусто-'
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ScalableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    list_filter = (AuthorFilter, 'pub_date')
+    autocomplete_fields = ('author', 'group')
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        query = search.to_query(search_term)
+        if query is None:
+            return queryset.none(), False
+        return queryset.filter(search_index__text__match=query), False
 
-class CommentsAdmin(admin.ModelAdmin):
+
+class CommentsAdmin(UsernameSearchAdmin):
     list_display = ('pk', 'text', 'post', 'author', 'created')
-    search_fields = ('post', 'author',)
-    list_filter = ('post', 'author')
-    empty_value_display = '-пусто-'
+    list_select_related = ('post', 'author')
+    search_fields = ('=author__username',)
+    username_fields = ('author',)
+    list_filter = (PostFilter, AuthorFilter)
+    autocomplete_fields = ('post', 'author')
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(UsernameSearchAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user', 'author',)
-    list_filter = ('user', 'author')
-    empty_value_display = '-пусто-'
+    list_select_related = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+    username_fields = ('user', 'author')
+    list_filter = (UserFilter, AuthorFilter)
+    autocomplete_fields = ('user', 'author')
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,223 @@
+"""JSON API только для чтения: посты, комментарии, группы, профили.
+
+Списки листаются курсорами (?cursor=, ?limit= до MAX_LIMIT), поле
+``next`` ответа содержит ссылку на следующую страницу; испорченный
+курсор — ошибка 400. Параметр
+?fields=id,text,author оставляет в ответе только перечисленные поля;
+столбцы, которые не нужны, не читаются из базы. Строки читаются через
+values_list без создания моделей, авторы и группы страницы догружаются
+одним запросом на каждую связь.
+"""
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .paginator import CursorPaginator, InvalidCursor
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+
+class ApiError(Exception):
+    status = 400
+
+
+class NotFound(ApiError):
+    status = 404
+
+
+def author_data(rows):
+    return {
+        pk: {'username': username,
+             'full_name': f'{first_name} {last_name}'.strip()}
+        for pk, username, first_name, last_name in rows
+    }
+
+
+def group_data(rows):
+    return {pk: {'slug': slug, 'title': title} for pk, slug, title in rows}
+
+
+# Поле ответа -> столбец; связи подставляются из RELATIONS.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated_at': 'updated_at',
+    'comment_count': 'comment_count',
+    'image': 'image',
+    'author': 'author_id',
+    'group': 'group_id',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author_id',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+RELATIONS = {
+    'author': (User, ('id', 'username', 'first_name', 'last_name'),
+               author_data),
+    'group': (Group, ('id', 'slug', 'title'), group_data),
+}
+
+
+def requested_fields(request, available):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(available)
+    fields = [field for field in fields.split(',') if field]
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def serialize(request, rows, fields, available):
+    """Словари ответа из строк values_list(named=True)."""
+    related = {}
+    for field in fields:
+        if field in RELATIONS:
+            model, columns, build = RELATIONS[field]
+            ids = {getattr(row, available[field]) for row in rows}
+            ids.discard(None)
+            related[field] = build(model.objects.filter(
+                pk__in=ids).values_list(*columns))
+    items = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            value = getattr(row, available[field])
+            if field in related:
+                value = related[field].get(value)
+            elif field == 'image':
+                value = request.build_absolute_uri(
+                    IMAGE_STORAGE.url(value)) if value else None
+            item[field] = value
+        items.append(item)
+    return items
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'?{query.urlencode()}')
+
+
+def listing(request, queryset, available, order=('id',)):
+    fields = requested_fields(request, available)
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1),
+                    MAX_LIMIT)
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    columns = {available[field] for field in fields} | set(order)
+    rows = queryset.values_list(*columns, named=True)
+    paginator = CursorPaginator(rows, limit, fields=order)
+    cursor = request.GET.get('cursor')
+    try:
+        page = (paginator.cursor_page(cursor) if cursor
+                else paginator.get_page())
+    except InvalidCursor:
+        raise ApiError('Неверный курсор')
+    return {
+        'results': serialize(request, page.object_list, fields, available),
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    }
+
+
+def detail(request, queryset, available):
+    fields = requested_fields(request, available)
+    columns = {available[field] for field in fields}
+    rows = list(queryset.values_list(*columns, named=True)[:1])
+    if not rows:
+        raise NotFound('Не найдено')
+    return serialize(request, rows, fields, available)[0]
+
+
+def endpoint(view):
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            data = view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+        return JsonResponse(data, encoder=DjangoJSONEncoder,
+                            json_dumps_params={'ensure_ascii': False})
+    return wrapper
+
+
+def _lookup(model, **kwargs):
+    pk = model.objects.filter(**kwargs).values_list('pk', flat=True).first()
+    if pk is None:
+        raise NotFound('Не найдено')
+    return pk
+
+
+@endpoint
+def posts(request):
+    queryset = Post.objects.all()
+    if 'group' in request.GET:
+        queryset = queryset.filter(
+            group_id=_lookup(Group, slug=request.GET['group']))
+    if 'author' in request.GET:
+        queryset = queryset.filter(
+            author_id=_lookup(User, username=request.GET['author']))
+    return listing(request, queryset, POST_FIELDS, ('pub_date', 'id'))
+
+
+@endpoint
+def post_detail(request, post_id):
+    return detail(request, Post.objects.filter(pk=post_id), POST_FIELDS)
+
+
+@endpoint
+def post_comments(request, post_id):
+    queryset = Comment.objects.filter(post_id=_lookup(Post, pk=post_id))
+    return listing(request, queryset, COMMENT_FIELDS, ('created', 'id'))
+
+
+@endpoint
+def groups(request):
+    return listing(request, Group.objects.all(), GROUP_FIELDS)
+
+
+@endpoint
+def group_detail(request, slug):
+    return detail(request, Group.objects.filter(slug=slug), GROUP_FIELDS)
+
+
+@endpoint
+def profile(request, username):
+    author = User.objects.filter(username=username).select_related(
+        'stats').first()
+    if author is None:
+        raise NotFound('Не найдено')
+    stats = UserStats.of(author)
+    following = None
+    if request.user.is_authenticated:
+        following = Follow.objects.filter(
+            user=request.user, author=author).exists()
+    return {
+        'username': author.username,
+        'full_name': author.get_full_name(),
+        'post_count': stats.post_count,
+        'follower_count': stats.follower_count,
+        'following_count': stats.following_count,
+        'following': following,
+    }
@@ -0,0 +1,60 @@
+"""Кеш отрисованных карточек постов (post_item.html).
+
+Ключ карточки меняется вместе со всем, что она показывает: updated_at
+поста, число комментариев (оно обновляется в обход save()), имя автора,
+адрес и название группы и роль зрителя — аноним не видит кнопки
+комментария, автору доступна ссылка на редактирование. Карточки, чья
+миниатюра ещё готовится, не кешируются: картинка появится, как только
+будет готова.
+"""
+import hashlib
+import logging
+
+from django.core.cache import cache
+
+from . import thumbnails
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE = 'post_item.html'
+TIMEOUT = 24 * 60 * 60
+
+
+def role(post, user):
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    if user.pk == post.author_id:
+        return 'author'
+    return 'other'
+
+
+def key(post, user):
+    version = int(post.updated_at.timestamp() * 1000000)
+    group = ''
+    if post.group_id:
+        # Название может содержать пробелы, недопустимые в ключе memcached.
+        title = hashlib.md5(post.group.title.encode()).hexdigest()[:12]
+        group = f'{post.group.slug}.{title}'
+    return (f'post_card:{post.pk}:{version}:{post.comment_count}:'
+            f'{post.author.username}:{group}:{role(post, user)}')
+
+
+def render(posts, user, render_card):
+    """HTML карточек в порядке posts; промахи рисует render_card(post)."""
+    keys = {post.pk: key(post, user) for post in posts}
+    found = cache.get_many(keys.values())
+    missing = [post for post in posts if keys[post.pk] not in found]
+    if missing:
+        try:
+            thumbnails.prefetch(missing)
+        except Exception:
+            logger.exception('Thumbnail prefetch failed')
+        fresh = {}
+        for post in missing:
+            html = render_card(post)
+            found[keys[post.pk]] = html
+            if not post.image or getattr(post, 'prefetched_thumbnail',
+                                         None) is not None:
+                fresh[keys[post.pk]] = html
+        cache.set_many(fresh, TIMEOUT)
+    return [found[keys[post.pk]] for post in posts]
@@ -0,0 +1,88 @@
+"""Валидаторы для условных GET (ETag, Last-Modified) страниц постов.
+
+Считаются до основных запросов представления: ленты берут версии из
+кеша, профиль и пост — одну строку по индексу. Страницы различаются
+для разных зрителей (меню, кнопки подписки и редактирования), поэтому
+в ETag входит и зритель.
+
+Пост меняет updated_at при правке и при комментариях. Готовность
+миниатюры в нём не отражается, поэтому у постов с картинкой ETag
+зависит ещё от версии лент (её поднимает готовая миниатюра), а
+Last-Modified не отдаётся.
+
+Страница поста вошедшему пользователю содержит форму с CSRF-токеном,
+который меняется при каждом входе. Поэтому в её ETag входит и cookie
+с токеном, а Last-Modified таким зрителям не отдаётся вовсе.
+"""
+import hashlib
+
+from django.middleware.csrf import get_token
+
+from . import versions
+from .models import Post, UserStats
+
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _viewer(request):
+    return request.user.pk or 0
+
+
+def _form_viewer(request):
+    if not request.user.is_authenticated:
+        return (0, None)
+    # get_token заводит токен заранее, если cookie ещё нет: тогда ETag
+    # первого ответа совпадёт с тем, что браузер пришлёт в следующий раз.
+    get_token(request)
+    return request.user.pk, request.META['CSRF_COOKIE']
+
+
+def feed_etag(request, *args, **kwargs):
+    return _etag('feed', versions.feed(), _viewer(request))
+
+
+def follow_etag(request):
+    return _etag('follow', versions.feed(), versions.follow(request.user.pk),
+                 _viewer(request))
+
+
+def profile_etag(request, username):
+    # Подписка зрителя на автора меняет его версию follow.
+    state = UserStats.objects.filter(user__username=username).values_list(
+        'user_id', 'post_count', 'follower_count', 'following_count',
+        'user__first_name', 'user__last_name',
+    ).first()
+    if state is None:
+        return None
+    viewer = _viewer(request)
+    return _etag('profile', versions.feed(), versions.follow(viewer),
+                 viewer, *state)
+
+
+def _post_state(request, post_id):
+    # Django спрашивает ETag и Last-Modified по отдельности.
+    if not hasattr(request, '_post_state'):
+        request._post_state = Post.objects.filter(pk=post_id).values_list(
+            'updated_at', 'image', 'author__username', 'author__first_name',
+            'author__last_name',
+        ).first()
+    return request._post_state
+
+
+def post_etag(request, username, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    thumbnail = versions.feed() if state[1] else None
+    return _etag('post', *_form_viewer(request), thumbnail, *state)
+
+
+def post_last_modified(request, username, post_id):
+    if request.user.is_authenticated:
+        return None
+    state = _post_state(request, post_id)
+    if state is None or state[1]:
+        return None
+    return state[0]
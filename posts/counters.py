@@ -0,0 +1,81 @@
+"""Сверка денормализованных счётчиков с самими строками.
+
+Сигналы (posts/signals.py) держат счётчики в актуальном состоянии по
+одной записи; эти функции пересчитывают их пачками для выборки постов
+или пользователей — всей базы (recount_counters) или только того, что
+затронула пачка массовой загрузки (import_yatube).
+"""
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from yatube.sqlite import immediate
+from .models import Comment, Follow, Post, UserStats
+
+BATCH_SIZE = 1000
+
+
+def count_of(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def batches(queryset, batch_size):
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1][0]
+
+
+def repair_posts(posts, batch_size=BATCH_SIZE):
+    """Исправляет comment_count постов выборки и возвращает их число."""
+    rows = posts.annotate(
+        actual=count_of(Comment, 'post'),
+    ).values_list('pk', 'comment_count', 'actual')
+    repaired = 0
+    for batch in batches(rows, batch_size):
+        drifted = [
+            Post(pk=pk, comment_count=actual)
+            for pk, stored, actual in batch if stored != actual
+        ]
+        with immediate():
+            Post.objects.bulk_update(drifted, ['comment_count'])
+        repaired += len(drifted)
+    return repaired
+
+
+def repair_users(users, batch_size=BATCH_SIZE):
+    """Исправляет или создаёт UserStats пользователей выборки."""
+    fields = ['post_count', 'follower_count', 'following_count']
+    rows = users.annotate(
+        actual_posts=count_of(Post, 'author'),
+        actual_followers=count_of(Follow, 'author'),
+        actual_following=count_of(Follow, 'user'),
+    ).values_list(
+        'pk', 'actual_posts', 'actual_followers', 'actual_following',
+        'stats__post_count', 'stats__follower_count',
+        'stats__following_count',
+    )
+    repaired = 0
+    for batch in batches(rows, batch_size):
+        missing, drifted = [], []
+        for pk, *counts in batch:
+            actual, stored = counts[:3], counts[3:]
+            if actual == stored:
+                continue
+            stats = UserStats(pk, *actual)
+            if stored[0] is None:
+                missing.append(stats)
+            else:
+                drifted.append(stats)
+        with immediate():
+            UserStats.objects.bulk_create(missing)
+            UserStats.objects.bulk_update(drifted, fields)
+        repaired += len(missing) + len(drifted)
+    return repaired
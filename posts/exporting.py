@@ -0,0 +1,154 @@
+"""Потоковая выгрузка постов, комментариев, подписок и картинок.
+
+Таблицы пишутся в NDJSON в формате import_yatube (картинки он берёт
+из media/ архива по --media), строки читаются через
+iterator(chunk_size=CHUNK_SIZE). ZIP собирается в памяти только кусками:
+zipfile пишет в Sink, откуда накопленные байты сразу отдаются дальше,
+а оригиналы картинок копируются из хранилища по частям.
+"""
+import io
+import json
+import logging
+import time
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import Comment, Follow, Group, Post, User
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+FLUSH_SIZE = 64 * 1024
+
+# Имя в выгрузке -> путь в ORM.
+POST_COLUMNS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'group': 'group__slug',
+    'image': 'image',
+}
+COMMENT_COLUMNS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+FOLLOW_COLUMNS = {
+    'user': 'user__username',
+    'author': 'author__username',
+}
+GROUP_COLUMNS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+PROFILE_COLUMNS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'email': 'email',
+    'date_joined': 'date_joined',
+}
+
+
+def rows(queryset, columns):
+    keys = tuple(columns)
+    values = queryset.order_by('pk').values_list(*columns.values())
+    for row in values.iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(keys, row))
+
+
+def site_tables():
+    return {
+        'groups': rows(Group.objects.all(), GROUP_COLUMNS),
+        'posts': rows(Post.objects.all(), POST_COLUMNS),
+        'comments': rows(Comment.objects.all(), COMMENT_COLUMNS),
+        'follows': rows(Follow.objects.all(), FOLLOW_COLUMNS),
+    }
+
+
+def site_images():
+    return Post.objects.exclude(image='').exclude(image=None).order_by(
+        'pk').values_list('image', flat=True).iterator(chunk_size=CHUNK_SIZE)
+
+
+def user_tables(user):
+    return {
+        'profile': rows(User.objects.filter(pk=user.pk), PROFILE_COLUMNS),
+        'posts': rows(user.posts.all(), POST_COLUMNS),
+        'comments': rows(user.comments.all(), COMMENT_COLUMNS),
+        'follows': rows(Follow.objects.filter(
+            Q(user=user) | Q(author=user)), FOLLOW_COLUMNS),
+    }
+
+
+def user_images(user):
+    return user.posts.exclude(image='').exclude(image=None).order_by(
+        'pk').values_list('image', flat=True).iterator(chunk_size=CHUNK_SIZE)
+
+
+def ndjson(records):
+    for record in records:
+        yield (json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+               + '\n').encode()
+
+
+class Sink(io.RawIOBase):
+    """Файл без seek для zipfile: записанное забирается через drain()."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self, above=0):
+        if self.size > above:
+            yield b''.join(self.chunks)
+            self.chunks = []
+            self.size = 0
+
+
+def _entry(archive, name, compress_type):
+    info = zipfile.ZipInfo(name, time.localtime()[:6])
+    info.compress_type = compress_type
+    return archive.open(info, 'w', force_zip64=True)
+
+
+def zip_stream(tables, images=()):
+    """Байты ZIP-архива кусками: таблицы в <имя>.jsonl, картинки в media/."""
+    sink = Sink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for name, records in tables.items():
+            with _entry(archive, f'{name}.jsonl',
+                        zipfile.ZIP_DEFLATED) as entry:
+                for line in ndjson(records):
+                    entry.write(line)
+                    yield from sink.drain(FLUSH_SIZE)
+            yield from sink.drain()
+        for name in images:
+            try:
+                source = default_storage.open(name)
+            except OSError:
+                logger.warning('Export: image %s is missing', name)
+                continue
+            # Картинки уже сжаты, пересжимать их незачем.
+            with source, _entry(archive, f'media/{name}',
+                                zipfile.ZIP_STORED) as entry:
+                for chunk in source.chunks():
+                    entry.write(chunk)
+                    yield from sink.drain(FLUSH_SIZE)
+            yield from sink.drain()
+    yield from sink.drain()
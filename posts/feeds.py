@@ -0,0 +1,216 @@
+"""Ленты-подписки RSS, Atom и JSON Feed: весь сайт, группа, автор.
+
+В ленту попадают FEED_SIZE последних постов области (scope) в порядке
+индекса (pub_date, id). Готовое тело кешируется под версией области;
+версию, заведённую по id группы или автора, поднимают сигналы постов,
+так что кеш живёт до следующего изменения постов этой области. Имя
+автора в записях обновится через TIMEOUT. JSON Feed отдаётся потоком
+по мере чтения постов.
+"""
+import hashlib
+import json
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+
+from . import versions
+from .models import Group, Post, User
+
+FEED_SIZE = 20
+TIMEOUT = 24 * 60 * 60
+JSON_FEED_VERSION = 'https://jsonfeed.org/version/1.1'
+
+
+class FormatConverter:
+    regex = 'rss|atom|json'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+class Scope:
+    """Область ленты: группа или автор ищутся сразу, посты — в load()."""
+
+    def __init__(self, slug=None, username=None):
+        self.group = self.author = None
+        if slug is not None:
+            self.group = get_object_or_404(Group, slug=slug)
+            self.name = f'group:{self.group.pk}'
+        elif username is not None:
+            self.author = get_object_or_404(User, username=username)
+            self.name = f'author:{self.author.pk}'
+        else:
+            self.name = 'site'
+
+    @classmethod
+    def for_request(cls, request, slug=None, username=None):
+        # ETag и сама лента разбирают одну и ту же область запроса.
+        if not hasattr(request, '_feed_scope'):
+            request._feed_scope = cls(slug, username)
+        return request._feed_scope
+
+    def version(self):
+        return versions.scope(self.name)
+
+    def load(self):
+        posts = Post.objects.feed()
+        if self.group is not None:
+            self.title = f'Yatube: {self.group.title}'
+            self.description = self.group.description
+            self.link = reverse('group', kwargs={'slug': self.group.slug})
+            posts = posts.filter(group=self.group)
+        elif self.author is not None:
+            self.title = f'Yatube: @{self.author.username}'
+            self.description = f'Записи {author_name(self.author)}'
+            self.link = reverse('profile', kwargs={'username': self.author})
+            posts = posts.filter(author=self.author)
+        else:
+            self.title = 'Yatube'
+            self.description = 'Последние обновления на сайте'
+            self.link = reverse('index')
+        self.posts = posts.order_by('-pub_date', '-id')[:FEED_SIZE]
+
+
+def author_name(user):
+    return user.get_full_name() or user.username
+
+
+def post_link(post):
+    return reverse('post', kwargs={'username': post.author.username,
+                                   'post_id': post.pk})
+
+
+class PostFeed(Feed):
+    feed_type = Rss201rev2Feed
+
+    def get_object(self, request, scope):
+        return scope
+
+    def title(self, scope):
+        return scope.title
+
+    def link(self, scope):
+        return scope.link
+
+    def description(self, scope):
+        return scope.description
+
+    def items(self, scope):
+        return scope.posts
+
+    def item_title(self, post):
+        return Truncator(post.text).chars(80)
+
+    def item_description(self, post):
+        return linebreaksbr(post.text)
+
+    def item_link(self, post):
+        return post_link(post)
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated_at
+
+    def item_author_name(self, post):
+        return author_name(post.author)
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group_id else []
+
+
+class AtomPostFeed(PostFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, scope):
+        return scope.description
+
+
+def syndication(feed):
+    def render(request, scope):
+        response = feed(request, scope=scope)
+        return response['Content-Type'], [response.content]
+    return render
+
+
+def json_item(request, post):
+    item = {
+        'id': str(post.pk),
+        'url': request.build_absolute_uri(post_link(post)),
+        'content_text': post.text,
+        'date_published': post.pub_date.isoformat(),
+        'date_modified': post.updated_at.isoformat(),
+        'authors': [{
+            'name': author_name(post.author),
+            'url': request.build_absolute_uri(reverse(
+                'profile', kwargs={'username': post.author.username})),
+        }],
+    }
+    if post.group_id:
+        item['tags'] = [post.group.title]
+    if post.image:
+        item['image'] = request.build_absolute_uri(post.image.url)
+    return item
+
+
+def json_feed(request, scope):
+    def chunks():
+        head = json.dumps({
+            'version': JSON_FEED_VERSION,
+            'title': scope.title,
+            'description': scope.description,
+            'home_page_url': request.build_absolute_uri(scope.link),
+            'feed_url': request.build_absolute_uri(),
+        }, ensure_ascii=False)
+        # Объект открывается заголовком ленты, записи идут по одной.
+        yield head[:-1] + ', "items": ['
+        for number, post in enumerate(scope.posts.iterator()):
+            item = json.dumps(json_item(request, post), ensure_ascii=False)
+            yield (', ' if number else '') + item
+        yield ']}'
+    return 'application/feed+json; charset=utf-8', chunks()
+
+
+FORMATS = {
+    'rss': syndication(PostFeed()),
+    'atom': syndication(AtomPostFeed()),
+    'json': json_feed,
+}
+
+
+def etag(request, format, slug=None, username=None):
+    scope = Scope.for_request(request, slug, username)
+    return hashlib.md5(
+        f'{format}:{scope.name}:{scope.version()}'.encode()).hexdigest()
+
+
+def _remember(key, content_type, chunks):
+    body = []
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        body.append(chunk)
+        yield chunk
+    cache.set(key, (content_type, b''.join(body)), TIMEOUT)
+
+
+def serve(request, format, scope):
+    key = f'syndication:{format}:{scope.name}:{scope.version()}'
+    cached = cache.get(key)
+    if cached is not None:
+        content_type, body = cached
+        return HttpResponse(body, content_type=content_type)
+    scope.load()
+    content_type, chunks = FORMATS[format](request, scope)
+    return StreamingHttpResponse(_remember(key, content_type, chunks),
+                                 content_type=content_type)
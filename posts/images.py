@@ -0,0 +1,39 @@
+import hashlib
+
+from PIL import Image
+
+
+def read_meta(file):
+    """Размеры, формат, объём и sha256 картинки за один проход по файлу."""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format or ''
+    except OSError:
+        width = height = None
+        image_format = ''
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_format': image_format,
+        'image_size': size,
+        'image_hash': digest.hexdigest(),
+    }
+
+
+def empty_meta():
+    return {
+        'image_width': None,
+        'image_height': None,
+        'image_format': '',
+        'image_size': None,
+        'image_hash': '',
+    }
@@ -0,0 +1,351 @@
+"""Массовая загрузка постов, комментариев и подписок из JSONL или CSV.
+
+Записи читаются потоком и вставляются пачками по многу строк; каждая
+пачка коммитится вместе с отметкой ImportCheckpoint и пересчётом
+счётчиков затронутых ею постов и пользователей, поэтому прерванная
+загрузка продолжается с первой незакоммиченной пачки. Авторы и группы
+ищутся по имени и slug через ограниченные по размеру таблицы в памяти,
+недостающие создаются. Память не растёт с размером входа.
+
+Поля записей:
+    posts     id (необязательно), author, text, pub_date, group, image
+    comments  post, author, text, created
+    follows   user, author
+Даты — ISO 8601, без зоны считаются UTC; без даты берётся текущее время.
+Картинки постов копируются в хранилище из каталога media, если он
+указан (это папка media/ архива export_yatube); без него поле image
+пропускается.
+"""
+import csv
+import itertools
+import json
+import os
+from collections import Counter, OrderedDict
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from yatube.sqlite import immediate
+from . import counters, versions
+from .images import empty_meta, read_meta
+from .models import Comment, Follow, Group, ImportCheckpoint, Post, User
+from .seeding import last_id
+from .timeline import BACKFILL_LIMIT, FANOUT_LIMIT, mark_pulled
+
+KINDS = ('posts', 'comments', 'follows')
+FORMATS = ('jsonl', 'csv')
+CHUNK_SIZE = 2000
+LOOKUP_SIZE = 100000
+
+# Авторов с подписчиками больше FANOUT_LIMIT лента подтягивает при
+# чтении (см. timeline): их посты по лентам не раскладываются, а сами
+# авторы получают отметку pull_on_read.
+NOT_POPULAR = (
+    'NOT EXISTS (SELECT 1 FROM posts_follow popular '
+    'WHERE popular.author_id = p.author_id LIMIT 1 OFFSET %s)'
+)
+FAN_OUT_SQL = (
+    'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+    'FROM posts_post p JOIN posts_follow f ON f.author_id = p.author_id '
+    'WHERE p.id IN ({ids}) AND ' + NOT_POPULAR
+)
+PULLED_SQL = (
+    'SELECT DISTINCT p.author_id FROM posts_post p '
+    'WHERE p.id IN ({ids}) AND NOT ' + NOT_POPULAR
+)
+# Как timeline.backfill: последние посты автора, популярен он или нет.
+BACKFILL_SQL = (
+    'SELECT user_id, id, author_id, pub_date FROM ('
+    'SELECT f.user_id, p.id, p.author_id, p.pub_date, ROW_NUMBER() OVER ('
+    'PARTITION BY f.id ORDER BY p.pub_date DESC, p.id DESC) AS position '
+    'FROM posts_follow f JOIN posts_post p ON p.author_id = f.author_id '
+    'WHERE f.id > %s) WHERE position <= %s'
+)
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read(path, format, skip=0):
+    """Записи файла по одной, первые skip пропускаются без разбора."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if format == 'csv':
+            yield from itertools.islice(csv.DictReader(source), skip, None)
+            return
+        for line in itertools.islice(source, skip, None):
+            # Битая строка остаётся записью, чтобы не сбить отметку,
+            # и потом пропускается как неверная.
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def chunked(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert(objs):
+    """INSERT в обход pre_save: auto_now не подменяет даты из записей."""
+    if not objs:
+        return
+    meta = objs[0]._meta
+    fields = [field for field in meta.concrete_fields
+              if not field.primary_key or objs[0].pk is not None]
+    ops = connection.ops
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        ops.quote_name(meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(obj, field.attname), connection)
+             for field in fields]
+            for obj in objs
+        ])
+
+
+def required(record, name):
+    value = record.get(name)
+    if value in (None, ''):
+        raise InvalidRecord(name)
+    return str(value)
+
+
+def moment(record, name):
+    value = record.get(name)
+    if value in (None, ''):
+        return timezone.now()
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise InvalidRecord(name)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+class Lookup:
+    """Ключ -> id с вытеснением давно не встречавшихся ключей."""
+
+    def __init__(self, model, field, build, size=LOOKUP_SIZE):
+        self.model = model
+        self.field = field
+        self.build = build
+        self.size = size
+        self.ids = OrderedDict()
+
+    def _fetch(self, keys):
+        return dict(self.model.objects.filter(
+            **{f'{self.field}__in': keys}).values_list(self.field, 'pk'))
+
+    def resolve(self, keys):
+        found = {}
+        missing = []
+        for key in keys:
+            if key in self.ids:
+                self.ids.move_to_end(key)
+                found[key] = self.ids[key]
+            else:
+                missing.append(key)
+        if missing:
+            fetched = self._fetch(missing)
+            new = [key for key in missing if key not in fetched]
+            if new:
+                self.model.objects.bulk_create(
+                    [self.build(key) for key in new], ignore_conflicts=True)
+                fetched.update(self._fetch(new))
+            for key, pk in fetched.items():
+                self.ids[key] = pk
+            while len(self.ids) > self.size:
+                self.ids.popitem(last=False)
+            found.update(fetched)
+        return found
+
+
+def _insert_timeline(select, params):
+    ops = connection.ops
+    sql = (f'{ops.insert_statement(ignore_conflicts=True)} '
+           'posts_timelineentry (user_id, post_id, author_id, pub_date) '
+           f'{select} {ops.ignore_conflicts_suffix_sql(True)}')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+class Importer:
+    def __init__(self, id_offset=0, media=None):
+        self.id_offset = id_offset
+        self.media = media and os.path.abspath(media)
+        self.next_post_id = last_id(Post) + 1
+        self.users = Lookup(User, 'username', lambda username: User(
+            username=username, password=make_password(None)))
+        self.groups = Lookup(Group, 'slug', lambda slug: Group(
+            slug=slug, title=slug, description=''))
+        self.skipped = Counter()
+        # Чьи счётчики надо пересчитать в конце текущей пачки.
+        self.touched_posts = set()
+        self.touched_users = set()
+
+    def recount(self):
+        counters.repair_posts(Post.objects.filter(pk__in=self.touched_posts))
+        counters.repair_users(User.objects.filter(pk__in=self.touched_users))
+        self.touched_posts.clear()
+        self.touched_users.clear()
+
+    def _post_id(self, value):
+        if value in (None, ''):
+            post_id = self.next_post_id
+        else:
+            post_id = int(value) + self.id_offset
+        self.next_post_id = max(self.next_post_id, post_id + 1)
+        return post_id
+
+    def _image(self, name):
+        """Копирует картинку из каталога media и читает её метаданные."""
+        if not name or self.media is None:
+            return '', empty_meta()
+        path = os.path.abspath(os.path.join(self.media, name))
+        if not path.startswith(self.media + os.sep) or not os.path.isfile(
+                path):
+            self.skipped['missing image'] += 1
+            return '', empty_meta()
+        with open(path, 'rb') as source:
+            image = File(source)
+            meta = read_meta(image)
+            return default_storage.save(name, image), meta
+
+    def _parse(self, records, parse):
+        rows = []
+        for record in records:
+            try:
+                rows.append(parse(record))
+            except (InvalidRecord, ValueError, TypeError, AttributeError):
+                self.skipped['invalid'] += 1
+        return rows
+
+    def posts(self, records):
+        rows = self._parse(records, lambda record: (
+            self._post_id(record.get('id')), required(record, 'author'),
+            record.get('group') or None, required(record, 'text'),
+            moment(record, 'pub_date'), record.get('image') or '',
+        ))
+        existing = set(Post.objects.filter(
+            pk__in=[row[0] for row in rows]).values_list('pk', flat=True))
+        unique = []
+        for row in rows:
+            if row[0] in existing:
+                self.skipped['exists'] += 1
+            else:
+                existing.add(row[0])
+                unique.append(row)
+        rows = unique
+        authors = self.users.resolve({row[1] for row in rows})
+        groups = self.groups.resolve({row[2] for row in rows if row[2]})
+        posts = []
+        for post_id, author, group, text, pub_date, image in rows:
+            image, meta = self._image(image)
+            posts.append(Post(
+                id=post_id, author_id=authors[author],
+                group_id=groups.get(group), text=text, pub_date=pub_date,
+                updated_at=pub_date, image=image, **meta))
+        insert(posts)
+        self.touched_users.update(authors.values())
+        if posts:
+            ids = [post.id for post in posts]
+            placeholders = ', '.join(['%s'] * len(ids))
+            _insert_timeline(FAN_OUT_SQL.format(ids=placeholders),
+                             [*ids, FANOUT_LIMIT])
+            with connection.cursor() as cursor:
+                cursor.execute(PULLED_SQL.format(ids=placeholders),
+                               [*ids, FANOUT_LIMIT])
+                pulled = [row[0] for row in cursor.fetchall()]
+            if pulled:
+                mark_pulled(pulled)
+        return len(posts)
+
+    def comments(self, records):
+        rows = self._parse(records, lambda record: (
+            int(required(record, 'post')) + self.id_offset,
+            required(record, 'author'), required(record, 'text'),
+            moment(record, 'created'),
+        ))
+        posts = set(Post.objects.filter(
+            pk__in={row[0] for row in rows}).values_list('pk', flat=True))
+        self.skipped['unknown post'] += sum(row[0] not in posts
+                                            for row in rows)
+        rows = [row for row in rows if row[0] in posts]
+        authors = self.users.resolve({row[1] for row in rows})
+        comments = [
+            Comment(post_id=post_id, author_id=authors[author], text=text,
+                    created=created)
+            for post_id, author, text, created in rows
+        ]
+        insert(comments)
+        self.touched_posts.update(comment.post_id for comment in comments)
+        # Новым авторам комментариев тоже нужна строка UserStats.
+        self.touched_users.update(authors.values())
+        return len(comments)
+
+    def follows(self, records):
+        rows = self._parse(records, lambda record: (
+            required(record, 'user'), required(record, 'author'),
+        ))
+        self.skipped['self follow'] += sum(user == author
+                                           for user, author in rows)
+        rows = [(user, author) for user, author in rows if user != author]
+        users = self.users.resolve({name for row in rows for name in row})
+        before = last_id(Follow)
+        Follow.objects.bulk_create([
+            Follow(user_id=users[user], author_id=users[author])
+            for user, author in rows
+        ], ignore_conflicts=True)
+        self.touched_users.update(users.values())
+        created = Follow.objects.filter(pk__gt=before).count()
+        self.skipped['exists'] += len(rows) - created
+        if created:
+            _insert_timeline(BACKFILL_SQL, [before, BACKFILL_LIMIT])
+        return created
+
+
+def finish():
+    """Приводит в порядок то, что bulk_create делает в обход сигналов."""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+            cursor.execute(sql)
+    versions.bump_feed()
+    versions.bump_search()
+    versions.bump_all_scopes()
+
+
+def run(path, kind, format, chunk_size=CHUNK_SIZE, id_offset=0,
+        restart=False, progress=None, media=None):
+    """Загружает файл и возвращает число вставленных строк и пропусков."""
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+        source=f'{kind}:{os.path.abspath(path)}')
+    if restart:
+        checkpoint.position = 0
+    importer = Importer(id_offset, media)
+    load = getattr(importer, kind)
+    imported = 0
+    records = read(path, format, skip=checkpoint.position)
+    for chunk in chunked(records, chunk_size):
+        with immediate():
+            imported += load(chunk)
+            importer.recount()
+            checkpoint.position += len(chunk)
+            checkpoint.save()
+        if progress is not None:
+            progress(checkpoint.position, imported, importer.skipped)
+    finish()
+    return imported, importer.skipped
@@ -0,0 +1,48 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+
+from posts.images import read_meta
+from posts.models import Post
+from yatube.sqlite import immediate
+
+META_FIELDS = [
+    'image_width', 'image_height', 'image_format', 'image_size', 'image_hash'
+]
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, формат, объём и хеш картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = Post.objects.exclude(image='').exclude(
+            image__isnull=True).filter(image_hash='').only('pk', 'image')
+        filled = failed = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                pending.filter(pk__gt=last_pk).order_by('pk')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            updated = []
+            for post in batch:
+                try:
+                    with post.image.open('rb') as file:
+                        meta = read_meta(file)
+                except (OSError, SuspiciousFileOperation):
+                    failed += 1
+                    continue
+                for field, value in meta.items():
+                    setattr(post, field, value)
+                updated.append(post)
+            with immediate():
+                Post.objects.bulk_update(updated, META_FIELDS)
+            filled += len(updated)
+        self.stdout.write(
+            f'Заполнено постов: {filled}, файлов не найдено: {failed}'
+        )
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.sqlite3.base import FORMAT_QMARK_REGEX
+from django.utils import timezone
+
+from posts.models import Post
+from posts.views import POSTS_PER_PAGE
+from yatube.sqlite.base import apply_pragmas
+
+PROFILES = {
+    'delete': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+    'wal': settings.SQLITE_PRAGMAS,
+}
+COMMENT_SQL = ('INSERT INTO posts_comment (post_id, author_id, text, created) '
+               'VALUES (?, ?, ?, ?)')
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(path, isolation_level=None,
+                                 check_same_thread=False)
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def read_feed(path, pragmas, stop, stats, feed):
+    connection = connect(path, pragmas)
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            connection.execute(*feed).fetchall()
+        except sqlite3.OperationalError:
+            stats['errors'].append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+    stats['latencies'].extend(latencies)
+    connection.close()
+
+
+def write_comments(path, pragmas, stop, stats, comment):
+    connection = connect(path, pragmas)
+    count = 0
+    while not stop.is_set():
+        created = timezone.now().isoformat(' ')
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(COMMENT_SQL, (*comment, 'benchmark', created))
+            connection.execute('COMMIT')
+            count += 1
+        except sqlite3.OperationalError:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            stats['errors'].append(1)
+    stats['writes'].append(count)
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает чтение ленты при одновременной записи комментариев '
+            'в журнальных режимах DELETE и WAL на копии базы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        source = connections[options['database']]
+        if source.vendor != 'sqlite':
+            raise CommandError('Бенчмарк рассчитан только на SQLite')
+        post = Post.objects.using(options['database']).order_by('-id').first()
+        if post is None:
+            raise CommandError('В базе нет постов для чтения ленты')
+        sql, params = Post.objects.feed().order_by('-pub_date', '-id')[
+            :POSTS_PER_PAGE].query.sql_with_params()
+        feed = (FORMAT_QMARK_REGEX.sub('?', sql).replace('%%', '%'), params)
+        comment = (post.id, post.author_id)
+        source.ensure_connection()
+        with tempfile.TemporaryDirectory() as directory:
+            for name, pragmas in PROFILES.items():
+                path = os.path.join(directory, f'{name}.sqlite3')
+                target = sqlite3.connect(path)
+                source.connection.backup(target)
+                target.close()
+                result = self.bench(path, pragmas, feed, comment, options)
+                self.stdout.write(
+                    f'{name:>6}: чтений {result["reads"]:.0f}/с, '
+                    f'записей {result["writes"]:.0f}/с, '
+                    f'p95 чтения {result["p95"] * 1000:.1f} мс, '
+                    f'ошибок блокировки {result["errors"]}'
+                )
+
+    def bench(self, path, pragmas, feed, comment, options):
+        # Первое соединение переключает журнал копии в нужный режим.
+        connect(path, pragmas).close()
+        stop = threading.Event()
+        stats = {'latencies': [], 'writes': [], 'errors': []}
+        threads = [
+            threading.Thread(target=read_feed,
+                             args=(path, pragmas, stop, stats, feed))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=write_comments,
+                             args=(path, pragmas, stop, stats, comment))
+            for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return {
+            'reads': len(stats['latencies']) / options['duration'],
+            'writes': sum(stats['writes']) / options['duration'],
+            'p95': percentile(stats['latencies'], 0.95),
+            'errors': len(stats['errors']),
+        }
@@ -0,0 +1,185 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import seeding
+from posts.models import Group, Post, UserStats
+
+from .benchmark_sqlite import percentile
+
+# Отдельный кеш, чтобы прогон не читал и не портил кеш сайта.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+METRICS = ('p50_ms', 'p95_ms', 'queries', 'peak_kib')
+BENCHMARK_ALIAS = 'benchmark'
+
+
+@contextmanager
+def benchmark_database(path):
+    """Подставляет базу path вместо default на время прогона.
+
+    База открывается своим псевдонимом с явным NAME, настройки default
+    не меняются. Соединение псевдонима на время прогона отдаётся и
+    под именем default, чтобы сидер и страницы работали с ним.
+    """
+    connections.databases[BENCHMARK_ALIAS] = {
+        **settings.DATABASES[DEFAULT_DB_ALIAS], 'NAME': path,
+    }
+    default = connections[DEFAULT_DB_ALIAS]
+    benchmark = connections[BENCHMARK_ALIAS]
+    connections[DEFAULT_DB_ALIAS] = benchmark
+    try:
+        call_command('migrate', database=BENCHMARK_ALIAS, verbosity=0)
+        yield benchmark
+    finally:
+        connections[DEFAULT_DB_ALIAS] = default
+        benchmark.close()
+        del connections[BENCHMARK_ALIAS]
+        del connections.databases[BENCHMARK_ALIAS]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет страницы ленты на синтетических базах разного '
+            'размера и сравнивает результат с сохранённым эталоном')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='append',
+                            choices=sorted(seeding.SCALES))
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warm', action='store_true',
+                            help='не очищать кеш перед каждым запросом')
+        parser.add_argument('--data-dir',
+                            default=os.path.join(settings.BASE_DIR,
+                                                 'benchmarks'))
+        parser.add_argument('--reseed', action='store_true')
+        parser.add_argument('--output', default='benchmark-report.json')
+        parser.add_argument('--baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Бенчмарк рассчитан на SQLite')
+        os.makedirs(options['data_dir'], exist_ok=True)
+        report = {
+            'created': timezone.now().isoformat(),
+            'iterations': options['iterations'],
+            'warm': options['warm'],
+            'scales': {},
+        }
+        for scale in options['scale'] or ['small']:
+            report['scales'][scale] = self.run_scale(scale, options)
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        self.stdout.write(f'Отчёт записан в {options["output"]}')
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+
+    def run_scale(self, scale, options):
+        path = os.path.join(options['data_dir'], f'{scale}.sqlite3')
+        if options['reseed'] and os.path.exists(path):
+            os.remove(path)
+        with benchmark_database(path):
+            if not Post.objects.exists():
+                self.stdout.write(f'{scale}: заполняю базу…')
+                seeding.seed(**seeding.SCALES[scale])
+            with override_settings(CACHES=BENCHMARK_CACHES,
+                                   DATABASE_REPLICAS=[]):
+                views = {
+                    name: self.measure(client, url, options)
+                    for name, (client, url) in self.targets().items()
+                }
+        for name, result in views.items():
+            self.stdout.write(
+                f'{scale:>6} {name:<12} p50 {result["p50_ms"]:8.2f} мс  '
+                f'p95 {result["p95_ms"]:8.2f} мс  '
+                f'запросов {result["queries"]:3}  '
+                f'память {result["peak_kib"]:8.0f} КиБ'
+            )
+        return {'dataset': seeding.SCALES[scale], 'views': views}
+
+    def targets(self):
+        anonymous = Client()
+        reader = Client()
+        busiest = UserStats.objects.order_by('-following_count').first()
+        reader.force_login(busiest.user)
+        popular = UserStats.objects.order_by('-follower_count').first()
+        post = Post.objects.select_related('author').order_by(
+            '-comment_count').first()
+        group = Group.objects.order_by('-id').first()
+        return {
+            'index': (anonymous, reverse('index')),
+            'group': (anonymous, reverse('group',
+                                         kwargs={'slug': group.slug})),
+            'profile': (anonymous, reverse(
+                'profile', kwargs={'username': popular.user.username})),
+            'post_view': (anonymous, reverse('post', kwargs={
+                'username': post.author.username, 'post_id': post.id})),
+            'follow_index': (reader, reverse('follow_index')),
+        }
+
+    def measure(self, client, url, options):
+        client.get(url)
+        latencies = []
+        queries = 0
+        for _ in range(options['iterations']):
+            if not options['warm']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries = max(queries, len(captured))
+        if not options['warm']:
+            cache.clear()
+        tracemalloc.start()
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'queries': queries,
+            'peak_kib': peak / 1024,
+        }
+
+    def compare(self, report, path, tolerance):
+        with open(path) as file:
+            baseline = json.load(file)
+        regressions = []
+        for scale, current in report['scales'].items():
+            views = baseline['scales'].get(scale, {}).get('views', {})
+            for name, result in current['views'].items():
+                for metric in METRICS:
+                    old = views.get(name, {}).get(metric)
+                    if old is None:
+                        continue
+                    # Число запросов обязано совпадать, время и память
+                    # могут плавать в пределах допуска.
+                    limit = old if metric == 'queries' else old * (
+                        1 + tolerance)
+                    if result[metric] > limit:
+                        regressions.append(
+                            f'{scale} {name} {metric}: '
+                            f'{old:.1f} -> {result[metric]:.1f}')
+        if regressions:
+            raise CommandError('Регрессии относительно эталона:\n'
+                               + '\n'.join(regressions))
+        self.stdout.write('Регрессий относительно эталона нет')
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporting
+
+
+class Command(BaseCommand):
+    help = ('Выгружает сайт потоком: в .zip — все таблицы и картинки, '
+            'иначе одну таблицу --kind в NDJSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='файл .zip, .jsonl или - для '
+                                           'стандартного вывода')
+        parser.add_argument('--kind', choices=sorted(exporting.site_tables()))
+        parser.add_argument('--no-images', action='store_true')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        tables = exporting.site_tables()
+        if output.endswith('.zip'):
+            images = () if options['no_images'] else exporting.site_images()
+            chunks = exporting.zip_stream(tables, images)
+        elif options['kind'] is None:
+            raise CommandError('Для NDJSON укажите --kind')
+        else:
+            chunks = exporting.ndjson(tables[options['kind']])
+        if output == '-':
+            self.write(sys.stdout.buffer, chunks)
+        else:
+            with open(output, 'wb') as target:
+                self.write(target, chunks)
+
+    def write(self, target, chunks):
+        for chunk in chunks:
+            target.write(chunk)
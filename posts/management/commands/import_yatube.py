@@ -0,0 +1,56 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importing
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты, комментарии или подписки из JSONL или CSV; '
+            'прерванная загрузка продолжается с последней пачки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--kind', choices=importing.KINDS, required=True)
+        parser.add_argument('--format', choices=importing.FORMATS,
+                            help='по умолчанию — по расширению файла')
+        parser.add_argument('--chunk-size', type=int,
+                            default=importing.CHUNK_SIZE)
+        parser.add_argument('--id-offset', type=int, default=0,
+                            help='сдвиг id постов источника')
+        parser.add_argument('--restart', action='store_true',
+                            help='начать файл сначала, забыв отметку')
+        parser.add_argument('--media',
+                            help='каталог с картинками постов, например '
+                                 'media/ из архива export_yatube')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Нет файла {path}')
+        format = options['format']
+        if format is None:
+            format = os.path.splitext(path)[1].lstrip('.').lower()
+            if format not in importing.FORMATS:
+                raise CommandError('Укажите --format')
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+        imported, skipped = importing.run(
+            path, options['kind'], format,
+            chunk_size=options['chunk_size'],
+            id_offset=options['id_offset'],
+            restart=options['restart'],
+            progress=self.progress,
+            media=options['media'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Вставлено: {imported} за {elapsed:.1f} с, пропущено: '
+            f'{dict(skipped) or 0}'
+        )
+
+    def progress(self, position, imported, skipped):
+        if self.verbosity > 1:
+            self.stdout.write(f'Прочитано {position}, вставлено {imported}, '
+                              f'пропущено {sum(skipped.values())}')
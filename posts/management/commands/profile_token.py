@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from yatube.profiling import MODES, make_token
+
+
+class Command(BaseCommand):
+    help = ('Выдаёт одноразовое значение заголовка X-Profile для '
+            'профилирования запроса')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default=MODES[0])
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token(options['mode']))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=counters.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = counters.repair_posts(Post.objects.all(), batch_size)
+        users = counters.repair_users(User.objects.all(), batch_size)
+        self.stdout.write(
+            f'Исправлено постов: {posts}, пользователей: {users}'
+        )
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import seeding
+
+COUNTS = ('users', 'groups', 'posts', 'follows', 'comments')
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, подписками и комментариями')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(seeding.SCALES),
+                            default='small')
+        for name in COUNTS:
+            parser.add_argument(f'--{name}', type=int,
+                                help='переопределяет значение из --scale')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--images', type=float, default=0.0,
+                            help='доля постов с картинкой-заглушкой')
+        parser.add_argument('--days', type=int, default=365,
+                            help='за сколько дней распределить посты')
+        parser.add_argument('--until', type=parse_datetime,
+                            help='дата последнего поста, по умолчанию '
+                                 'сейчас; с ней база полностью '
+                                 'воспроизводима')
+
+    def handle(self, *args, **options):
+        # Даты пишутся строками в формате SQLite, а на время загрузки
+        # снимаются индексы и триггеры через sqlite_master.
+        if connection.vendor != 'sqlite':
+            raise CommandError('seed_yatube работает только с SQLite')
+        counts = dict(seeding.SCALES[options['scale']])
+        for name in COUNTS:
+            if options[name] is not None:
+                counts[name] = options[name]
+        if counts['users'] < 1 and (counts['posts'] or counts['follows']):
+            raise CommandError('Для постов и подписок нужны пользователи')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images задаётся долей от 0 до 1')
+        started = time.perf_counter()
+        until = options['until']
+        if until is not None and timezone.is_naive(until):
+            until = timezone.make_aware(until, timezone.utc)
+        rows = seeding.seed(random_seed=options['seed'],
+                            images=options['images'], days=options['days'],
+                            until=until, **counts)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Вставлено строк: {rows} за {elapsed:.1f} с '
+            f'({rows / elapsed:.0f} строк/с)'
+        )
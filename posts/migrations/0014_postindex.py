@@ -0,0 +1,26 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_image_meta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostIndex',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='posts.Post')),
+                ('text', posts.search.SearchField()),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:11
+
+from django.db import migrations, models
+
+# timeline.FANOUT_LIMIT на момент миграции.
+FANOUT_LIMIT = 5000
+
+
+def mark_popular(apps, schema_editor):
+    # Посты нынешних популярных авторов могли не попасть в ленты.
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(follower_count__gt=FANOUT_LIMIT).update(
+        pull_on_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pull_on_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_popular, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['author'], name='timeline_author'),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.expressions import RawSQL
+
+from . import search
+from .images import empty_meta, read_meta
 
 User = get_user_model()
 
@@ -24,16 +28,34 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        return self.select_related('author', 'group')
+
+    def search(self, text):
+        found = self.feed().annotate(
+            score=RawSQL(search.rank_sql(), (),
+                         output_field=models.FloatField()),
+            snippet=RawSQL(search.snippet_sql(), (),
+                           output_field=models.TextField()),
+        )
+        query = search.to_query(text)
+        if query is None:
+            return found.none()
+        return found.filter(search_index__text__match=query)
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст',
         help_text='Добавьте ваш текст сюда'
     )
     pub_date = models.DateTimeField('date published', auto_now_add=True)
+    updated_at = models.DateTimeField('updated', auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='posts')
+                               related_name='posts', db_index=False)
     group = models.ForeignKey(Group, verbose_name='Группа',
-                              on_delete=models.SET_NULL,
+                              on_delete=models.SET_NULL, db_index=False,
                               related_name='posts', blank=True, null=True)
     image = models.ImageField(
         verbose_name='Изображение',
@@ -41,17 +63,57 @@ class Post(models.Model):
         blank=True, null=True,
         help_text='Загрузите картинку',
     )
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_format = models.CharField(max_length=10, blank=True,
+                                    editable=False)
+    image_size = models.BigIntegerField(null=True, editable=False)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты сортируются по (pub_date, id); индексы по внешним ключам
+        # заменены составными с тем же ведущим столбцом.
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='post_pub_date'),
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_pub_date'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_pub_date'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Автор и группа на момент загрузки: по ним сигналы находят ленты,
+        # из которых пост уходит при переносе, не перечитывая строку.
+        post._loaded_scopes = (post.__dict__.get('author_id'),
+                               post.__dict__.get('group_id'))
+        return post
+
+    def save(self, *args, **kwargs):
+        # Метаданные читаются из только что загруженного файла, пока он
+        # ещё в памяти; сохранённые картинки больше не открываются.
+        if not self.image:
+            meta = empty_meta()
+        elif not self.image._committed:
+            meta = read_meta(self.image.file)
+        else:
+            meta = {}
+        for field, value in meta.items():
+            setattr(self, field, value)
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
-                             related_name='comments')
+                             related_name='comments', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='comments')
     text = models.TextField(
@@ -63,13 +125,17 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created'),
+        ]
 
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
-                             related_name='follower')
+                             related_name='follower', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='following')
+                               related_name='following', db_index=False)
 
     class Meta:
         constraints = [
@@ -78,3 +144,82 @@ class Follow(models.Model):
                 name='unique_follow'
             ),
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'], name='follow_author'),
+        ]
+
+
+class PostIndex(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.DO_NOTHING,
+                                primary_key=True, db_column='rowid',
+                                related_name='search_index')
+    text = search.SearchField()
+
+    class Meta:
+        managed = False
+        db_table = search.TABLE
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Хоть один пост автора не разложен по лентам (см. timeline); отметка
+    # не снимается, даже когда подписчиков становится меньше.
+    pull_on_read = models.BooleanField(default=False)
+
+    @classmethod
+    def of(cls, user):
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            return cls.recount(user.pk)
+
+    @classmethod
+    def recount(cls, user_id):
+        stats, _ = cls.objects.update_or_create(user_id=user_id, defaults={
+            'post_count': Post.objects.filter(author_id=user_id).count(),
+            'follower_count': Follow.objects.filter(
+                author_id=user_id).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id).count(),
+        })
+        return stats
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline', db_index=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+', db_index=False)
+    pub_date = models.DateTimeField('date published')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='timeline_user_pub_date'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author'),
+            # Каскадное удаление автора ищет его записи по author_id.
+            models.Index(fields=['author'], name='timeline_author'),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько записей источника уже загрузила команда import_yatube."""
+    source = models.CharField(max_length=500, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
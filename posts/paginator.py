@@ -0,0 +1,181 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Max, Q, QuerySet
+from django.utils.functional import cached_property
+
+# Старые ссылки вида ?page=N обслуживаются через OFFSET только до этой
+# глубины, дальше листать можно лишь курсорами.
+MAX_LEGACY_PAGE = 50
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (keyset) без COUNT(*) и OFFSET.
+
+    Записи упорядочиваются по убыванию полей ``fields``; граница страницы
+    передаётся в непрозрачном токене ``?cursor=``. Возвращаемые страницы
+    остаются обычными ``Page`` и дополнительно несут атрибуты
+    ``next_cursor`` и ``previous_cursor``. Страница, прочитанная вперёд
+    из QuerySet, хранит в ``object_list`` QuerySet с уже загруженными
+    строками.
+    """
+
+    def __init__(self, object_list, per_page, fields=('pub_date', 'id')):
+        self.fields = tuple(fields)
+        object_list = object_list.order_by(*('-' + f for f in self.fields))
+        super().__init__(object_list, per_page)
+        self._num_pages = 1
+        self._count = 0
+
+    @property
+    def num_pages(self):
+        # Известна только глубина до текущей страницы включительно
+        # (и ещё одна, если записи не кончились).
+        return self._num_pages
+
+    @property
+    def count(self):
+        return self._count
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            try:
+                return self.cursor_page(cursor)
+            except InvalidCursor:
+                pass
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        number = min(max(number, 1), MAX_LEGACY_PAGE)
+        return self._offset_page(number)
+
+    def cursor_page(self, cursor):
+        """Страница по курсору; нераспознанный курсор — InvalidCursor.
+
+        Если за границей курсора записей не осталось, отдаётся первая.
+        """
+        position = self._decode(cursor)
+        if position is None:
+            raise InvalidCursor('Неверный курсор')
+        page = self._keyset_page(*position)
+        if page is None:
+            return self._offset_page(1)
+        return page
+
+    def _forward(self, queryset, number, bottom=0):
+        rows = list(queryset[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            return None
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        page = self._build(rows, number, has_next)
+        if isinstance(queryset, QuerySet):
+            # Лишняя строка нужна только чтобы узнать о следующей странице;
+            # сама страница — QuerySet с уже прочитанными строками.
+            page.object_list = queryset[bottom:bottom + self.per_page]
+            page.object_list._result_cache = rows
+            page.object_list._prefetch_done = True
+        return page
+
+    def _offset_page(self, number):
+        page = self._forward(self.object_list, number,
+                             (number - 1) * self.per_page)
+        if page is None:
+            return self._offset_page(1)
+        return page
+
+    def _keyset_page(self, direction, number, values):
+        if direction == 'next':
+            queryset = self.object_list.filter(self._beyond(values, 'lt'))
+            return self._forward(queryset, number)
+        else:
+            queryset = self.object_list.filter(self._beyond(values, 'gt'))
+            rows = list(queryset.reverse()[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+            number = max(number, 2) if has_previous else 1
+        if not rows:
+            return None
+        return self._build(rows, number, has_next)
+
+    def _beyond(self, values, op):
+        # (a, b) < (x, y)  ->  a <= x AND (a < x OR (a = x AND b < y));
+        # первое условие даёт планировщику диапазон по индексу.
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            exact = dict(zip(self.fields[:i], values))
+            exact[f'{field}__{op}'] = values[i]
+            condition |= Q(**exact)
+        return Q(**{f'{self.fields[0]}__{op}e': values[0]}) & condition
+
+    def _build(self, rows, number, has_next):
+        self._num_pages = number + 1 if has_next else number
+        self._count = (number - 1) * self.per_page + len(rows) + has_next
+        page = self._get_page(rows, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if has_next:
+            page.next_cursor = self._encode('next', number + 1, rows[-1])
+        if number > 1:
+            page.previous_cursor = self._encode('prev', number - 1, rows[0])
+        return page
+
+    def _field(self, name):
+        # Ключом может быть и аннотация, например ранг в поиске.
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def _encode(self, direction, number, obj):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps([direction, number, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def _decode(self, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, number, values = json.loads(raw.decode())
+            if direction not in ('next', 'prev') or len(values) != len(
+                    self.fields):
+                return None
+            values = [self._field(f).to_python(v)
+                      for f, v in zip(self.fields, values)]
+            return direction, max(int(number), 1), values
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+                FieldDoesNotExist, ValidationError):
+            return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки без полного COUNT(*).
+
+    Для всей таблицы число записей оценивается по максимальному
+    первичному ключу, для отфильтрованной выборки считается не дальше
+    COUNT_LIMIT строк.
+    """
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return queryset.model._default_manager.aggregate(
+                top=Max('pk'))['top'] or 0
+        return queryset.order_by()[:self.COUNT_LIMIT].count()
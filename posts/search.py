@@ -0,0 +1,157 @@
+"""Полнотекстовый поиск по Post.text на SQLite FTS5.
+
+Индекс posts_post_fts — external content таблица над posts_post; её
+синхронизируют триггеры. Django при некоторых миграциях SQLite
+пересоздаёт таблицу posts_post и теряет триггеры, поэтому install()
+вызывается после каждого migrate и восстанавливает их с перестройкой
+индекса.
+
+Ранг bm25 — число с плавающей точкой, и он сдвигается с каждым новым
+постом, поэтому курсором по нему выдачу не пролистать. Вместо этого
+найденные id запоминаются в кеше кусками по CHUNK_SIZE под версией
+поиска (versions.search), и страницы выдачи режутся из этих кусков.
+Следующий кусок читается, только когда до него долистали; пока версия
+та же, набор постов не менялся и OFFSET продолжает прежний порядок.
+Дальше MAX_RESULTS выдача не листается.
+"""
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.db import connection, models
+
+TABLE = 'posts_post_fts'
+TRIGGERS = {
+    'posts_post_fts_insert': f'''
+        CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post
+        BEGIN
+            INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);
+        END''',
+    'posts_post_fts_delete': f'''
+        CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post
+        BEGIN
+            INSERT INTO {TABLE}({TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END''',
+    'posts_post_fts_update': f'''
+        CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text
+        ON posts_post
+        BEGIN
+            INSERT INTO {TABLE}({TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);
+        END''',
+}
+MAX_TERMS = 10
+CHUNK_SIZE = 500
+MAX_RESULTS = 10000
+RESULTS_TIMEOUT = 10 * 60
+# Маркеры подсветки в snippet(): управляющие символы не встречаются
+# в тексте постов и переживают экранирование HTML.
+MARK_START = chr(2)
+MARK_END = chr(3)
+
+
+class SearchField(models.TextField):
+    pass
+
+
+@SearchField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+def install(using=connection):
+    if using.vendor != 'sqlite':
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'posts_post'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing >= set(TRIGGERS):
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        for name, sql in TRIGGERS.items():
+            if name not in existing:
+                cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+
+
+def suspend(using=connection):
+    """Снимает триггеры индекса на время массовой загрузки постов.
+
+    Построить индекс заново после загрузки быстрее, чем обновлять его
+    на каждой строке; это сделает install().
+    """
+    if using.vendor != 'sqlite':
+        return
+    with using.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def to_query(text):
+    """Запрос пользователя в синтаксис FTS5: все слова, последнее — префикс.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 из ввода не
+    интерпретируются.
+    """
+    terms = re.findall(r'\w+', text)[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def snippet_sql():
+    return f"snippet({TABLE}, 0, char(2), char(3), '…', 16)"
+
+
+def rank_sql():
+    # bm25() тем меньше, чем лучше совпадение; пагинатор идёт по убыванию.
+    return f'-bm25({TABLE})'
+
+
+def _chunk(posts, text, prefix, number):
+    # Лишний id показывает, есть ли что-то за концом куска.
+    key = f'{prefix}:{number}'
+    chunk = cache.get(key)
+    if chunk is None:
+        start = number * CHUNK_SIZE
+        ids = list(posts.search(text).order_by('-score', '-id').values_list(
+            'id', flat=True)[start:start + CHUNK_SIZE + 1])
+        chunk = (ids[:CHUNK_SIZE], len(ids) > CHUNK_SIZE)
+        cache.set(key, chunk, RESULTS_TIMEOUT)
+    return chunk
+
+
+def ranked_ids(posts, text, version, start, stop):
+    """id найденных постов с start по stop по убыванию релевантности.
+
+    Вторым значением возвращается, есть ли результаты дальше stop.
+    """
+    query = to_query(text)
+    if query is None:
+        return [], False
+    digest = hashlib.md5(query.encode()).hexdigest()
+    prefix = f'search:{digest}:{version}'
+    ids = []
+    for number in range(start // CHUNK_SIZE, (stop - 1) // CHUNK_SIZE + 1):
+        chunk, more = _chunk(posts, text, prefix, number)
+        base = number * CHUNK_SIZE
+        ids += chunk[max(start - base, 0):stop - base]
+        if stop - base < len(chunk):
+            return ids, True
+        if not more:
+            return ids, False
+    return ids, True
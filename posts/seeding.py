@@ -0,0 +1,425 @@
+"""Наполнение базы синтетическими данными для бенчмарков.
+
+Распределения похожи на живую соцсеть: число подписчиков и комментариев
+подчиняется степенному закону, посты идут всплесками. Всё выводится из
+random_seed, поэтому одинаковые параметры дают одинаковую базу.
+"""
+import datetime
+import io
+import itertools
+import math
+import random
+from array import array
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+from PIL import Image
+
+from yatube.sqlite import immediate
+from . import search, versions
+from .images import empty_meta, read_meta
+from .models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                     UserStats)
+from .timeline import BACKFILL_LIMIT
+
+SCALES = {
+    'small': {'users': 1000, 'groups': 10, 'posts': 10000,
+              'follows': 2000, 'comments': 20000},
+    'medium': {'users': 10000, 'groups': 50, 'posts': 100000,
+               'follows': 20000, 'comments': 200000},
+    'large': {'users': 100000, 'groups': 200, 'posts': 1000000,
+              'follows': 100000, 'comments': 1000000},
+    'huge': {'users': 1000000, 'groups': 1000, 'posts': 3000000,
+             'follows': 3000000, 'comments': 5000000},
+}
+CHUNK_SIZE = 20000
+# Параметров на один INSERT: предел старых сборок SQLite.
+MAX_PARAMS = 999
+# Показатели степенных законов: кому подписываются, кто пишет,
+# что комментируют.
+FOLLOW_EXPONENT = 1.1
+POSTING_EXPONENT = 0.8
+COMMENT_EXPONENT = 0.9
+# Доля постов, написанных во время всплесков, во сколько раз чаще
+# они идут и вероятность закончить всплеск после очередного поста.
+BURST_SHARE = 0.4
+BURST_SPEEDUP = 10
+BURST_END = 0.02
+BURST_START = BURST_END * BURST_SHARE / (1 - BURST_SHARE)
+STUB_IMAGES = 8
+# Кеш страниц SQLite на время загрузки, в КиБ (отрицательное значение).
+LOAD_CACHE_SIZE = -262144
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class PowerLaw:
+    """Случайный номер от 0 до n - 1 с вероятностью ранга k ~ k^-exponent.
+
+    Ранги переставлены умножением по модулю n, чтобы популярные записи
+    не шли подряд.
+    """
+
+    def __init__(self, rng, n, exponent, salt):
+        self.random = rng.random
+        self.n = n
+        self.exponent = exponent
+        self.low = 1 - exponent
+        self.top = (n + 1) ** self.low - 1 if exponent != 1 else 0
+        self.step = 2654435761 % n or 1
+        while math.gcd(self.step, n) != 1:
+            self.step += 1
+        self.salt = salt
+
+    def __call__(self):
+        if self.exponent == 1:
+            x = (self.n + 1) ** self.random()
+        else:
+            x = (self.top * self.random() + 1) ** (1 / self.low)
+        rank = min(int(x) - 1, self.n - 1)
+        return (rank * self.step + self.salt) % self.n
+
+    def sample(self, count):
+        """То же, что count вызовов подряд, но без накладных расходов."""
+        n, step, salt, random = self.n, self.step, self.salt, self.random
+        if self.exponent == 1:
+            xs = [(n + 1) ** random() for _ in range(count)]
+        else:
+            top, power = self.top, 1 / self.low
+            xs = [(top * random() + 1) ** power for _ in range(count)]
+        return array('q', [(min(int(x) - 1, n - 1) * step + salt) % n
+                           for x in xs])
+
+
+def chunks(count, size=CHUNK_SIZE):
+    for start in range(0, count, size):
+        yield range(start, min(start + size, count))
+
+
+def insert(model, fields, rows, constants=None):
+    """Вставляет готовые кортежи значений, по многу строк на INSERT.
+
+    Значения уже приведены к виду для БД: подготовка каждого поля
+    в bulk_create обходится дороже самой вставки. Поля из constants
+    одинаковы во всех строках и пишутся в запрос литералами, а не
+    параметрами.
+    """
+    constants = constants or {}
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column)
+                        for name in (*fields, *constants))
+    literal = connection.schema_editor().quote_value
+    values = '({})'.format(', '.join(
+        ['%s'] * len(fields) + [literal(value)
+                                for value in constants.values()]))
+    per_statement = max(MAX_PARAMS // len(fields), 1)
+    sql = f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES '
+    whole = len(rows) - len(rows) % per_statement
+    with immediate(), connection.cursor() as cursor:
+        cursor.executemany(sql + ', '.join([values] * per_statement), [
+            list(itertools.chain.from_iterable(
+                rows[start:start + per_statement]))
+            for start in range(0, whole, per_statement)
+        ])
+        if whole < len(rows):
+            cursor.executemany(sql + values, rows[whole:])
+    return len(rows)
+
+
+def new_ids(model, after):
+    return array('q', model.objects.filter(pk__gt=after).order_by(
+        'pk').values_list('pk', flat=True))
+
+
+def last_id(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True)
+    return last.first() or 0
+
+
+@contextmanager
+def bulk_load(*models):
+    """Готовит базу SQLite к массовой загрузке и возвращает как было.
+
+    Все индексы таблиц, кроме уникальных, и триггеры поиска снимаются:
+    построить индекс по готовой таблице сортировкой быстрее, чем
+    обновлять его на каждой строке. Проверка внешних ключей
+    отключается — сгенерированные связи согласованы по построению.
+    На время загрузки отключается и fsync.
+    """
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+            "AND sql IS NOT NULL AND tbl_name IN ({})".format(
+                ', '.join(['%s'] * len(tables))),
+            tables,
+        )
+        indexes = cursor.fetchall()
+        cursor.execute('PRAGMA synchronous')
+        synchronous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA cache_size')
+        cache_size = cursor.fetchone()[0]
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+        cursor.execute('PRAGMA temp_store')
+        temp_store = cursor.fetchone()[0]
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        cursor.execute('PRAGMA synchronous = OFF')
+        cursor.execute(f'PRAGMA cache_size = {LOAD_CACHE_SIZE}')
+        cursor.execute('PRAGMA journal_mode = MEMORY')
+        cursor.execute('PRAGMA temp_store = MEMORY')
+    search.suspend()
+    try:
+        with connection.constraint_checks_disabled():
+            yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+            cursor.execute(f'PRAGMA synchronous = {synchronous}')
+            cursor.execute(f'PRAGMA cache_size = {cache_size}')
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+            cursor.execute(f'PRAGMA temp_store = {temp_store}')
+        search.install()
+
+
+def stub_images(rng):
+    """Несколько маленьких картинок, общих для всех сгенерированных постов."""
+    stubs = []
+    for number in range(STUB_IMAGES):
+        name = f'posts/seed/stub{number}.jpg'
+        if not default_storage.exists(name):
+            color = tuple(rng.randrange(256) for _ in range(3))
+            content = io.BytesIO()
+            Image.new('RGB', (960, 339), color).save(content, 'JPEG')
+            default_storage.save(name, ContentFile(content.getvalue()))
+        with default_storage.open(name) as file:
+            stubs.append((name, read_meta(file)))
+    return stubs
+
+
+class Seeder:
+    def __init__(self, random_seed=0, images=0.0, days=365, until=None):
+        self.rng = random.Random(random_seed)
+        self.images = images
+        self.end = (until or timezone.now()).timestamp()
+        self.dates = {}
+        self.clock = [f'{hours:02}:{minutes:02}:{seconds:02}'
+                      for hours in range(24) for minutes in range(60)
+                      for seconds in range(60)]
+        self.start = self.end - days * 86400
+        self.rows = 0
+
+    def run(self, users, groups, posts, follows, comments):
+        self.create_users(users)
+        self.create_groups(groups)
+        self.plan_follows(follows)
+        self.plan_posts(posts)
+        self.plan_comments(comments)
+        with bulk_load(Post, Comment, Follow, TimelineEntry):
+            self.create_posts()
+            self.create_follows()
+            self.create_comments()
+            self.create_timelines()
+        self.create_stats()
+        versions.bump_feed()
+        versions.bump_search()
+        versions.bump_all_scopes()
+        return self.rows
+
+    def create_users(self, count):
+        offset = User.objects.count()
+        before = last_id(User)
+        password = make_password(None)
+        joined = self.moment(self.start)
+        fields = ('username', 'password', 'first_name', 'last_name',
+                  'email', 'is_superuser', 'is_staff', 'is_active',
+                  'date_joined')
+        for chunk in chunks(count):
+            self.rows += insert(User, fields, [
+                (f'user{offset + i}', password, '', '', '',
+                 False, False, True, joined)
+                for i in chunk
+            ])
+        self.user_ids = new_ids(User, before)
+
+    def create_groups(self, count):
+        offset = Group.objects.count()
+        before = last_id(Group)
+        self.rows += insert(Group, ('title', 'slug', 'description'), [
+            (f'Группа {offset + i}', f'group-{offset + i}', '')
+            for i in range(count)
+        ])
+        self.group_ids = new_ids(Group, before)
+
+    def plan_follows(self, count):
+        # Пара (подписчик, автор) кодируется одним числом.
+        n = len(self.user_ids)
+        count = min(count, n * (n - 1))
+        pairs = set()
+        popular = PowerLaw(self.rng, n, FOLLOW_EXPONENT, 1) if n else None
+        while len(pairs) < count:
+            author = popular()
+            user = self.rng.randrange(n)
+            if user != author:
+                pairs.add(user * n + author)
+        self.follows = sorted(pairs)
+        self.followers = array('q', [0]) * n
+        self.following = array('q', [0]) * n
+        for pair in self.follows:
+            self.following[pair // n] += 1
+            self.followers[pair % n] += 1
+
+    def plan_posts(self, count):
+        # Время постов — пуассоновский поток, скорость которого
+        # переключается между обычной и всплеском; потом он сжимается
+        # в промежуток [start, end].
+        n = len(self.user_ids)
+        bursting = False
+        moment = 0.0
+        self.post_times = array('d')
+        self.posts_by_author = {}
+        random, delay = self.rng.random, self.rng.expovariate
+        self.post_authors = (PowerLaw(self.rng, n, POSTING_EXPONENT, 2)
+                             .sample(count) if n else array('q'))
+        for i, author in enumerate(self.post_authors):
+            if random() < (BURST_END if bursting else BURST_START):
+                bursting = not bursting
+            moment += delay(BURST_SPEEDUP if bursting else 1)
+            self.post_times.append(moment)
+            self.posts_by_author.setdefault(author, array('q')).append(i)
+        scale = (self.end - self.start) / (moment or 1)
+        for i, moment in enumerate(self.post_times):
+            self.post_times[i] = self.start + moment * scale
+        self.post_moments = [self.moment(moment)
+                             for moment in self.post_times]
+        self.comment_counts = array('q', [0]) * count
+
+    def plan_comments(self, count):
+        n = len(self.post_times)
+        self.comment_posts = (PowerLaw(self.rng, n, COMMENT_EXPONENT, 3)
+                              .sample(count) if n else array('q'))
+        for post in self.comment_posts:
+            self.comment_counts[post] += 1
+
+    def moment(self, timestamp):
+        # Строка в том виде, в каком Django хранит даты в SQLite при
+        # USE_TZ: UTC без зоны. Время округляется до секунды и собирается
+        # из готовых дат и времён суток: str(datetime) в разы медленнее.
+        days, seconds = divmod(int(timestamp), 86400)
+        date = self.dates.get(days)
+        if date is None:
+            date = self.dates[days] = '{} '.format(
+                EPOCH.date() + datetime.timedelta(days=days))
+        return date + self.clock[seconds]
+
+    def create_posts(self):
+        stubs = stub_images(self.rng) if self.images else []
+        before = last_id(Post)
+        groups = list(self.group_ids) + [None]
+        fields = ('text', 'pub_date', 'updated_at', 'author', 'group',
+                  'comment_count')
+        blank = {'image': '', **empty_meta()}
+        pictured = []
+        pick, random = self.rng.choice, self.rng.random
+        for chunk in chunks(len(self.post_times)):
+            rows = []
+            for i in chunk:
+                if stubs and random() < self.images:
+                    pictured.append((i, pick(stubs)))
+                moment = self.post_moments[i]
+                rows.append((
+                    f'Пост {i}', moment, moment,
+                    self.user_ids[self.post_authors[i]], pick(groups),
+                    self.comment_counts[i],
+                ))
+            self.rows += insert(Post, fields, rows, blank)
+        self.post_ids = new_ids(Post, before)
+        # Картинки есть у малой доли постов: их поля проставляются
+        # отдельно, чтобы не передавать пустые значения в каждой строке.
+        meta_fields = tuple(empty_meta())
+        columns = ', '.join(f'{field} = %s'
+                            for field in ('image', *meta_fields))
+        with immediate(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {Post._meta.db_table} SET {columns} WHERE id = %s',
+                [(name, *(meta[field] for field in meta_fields),
+                  self.post_ids[i]) for i, (name, meta) in pictured],
+            )
+
+    def create_follows(self):
+        n = len(self.user_ids)
+        for chunk in chunks(len(self.follows)):
+            self.rows += insert(Follow, ('user', 'author'), [
+                (self.user_ids[self.follows[i] // n],
+                 self.user_ids[self.follows[i] % n])
+                for i in chunk
+            ])
+
+    def create_comments(self):
+        fields = ('post', 'author', 'text', 'created')
+        user_ids, post_ids = self.user_ids, self.post_ids
+        post_times, moment, log = self.post_times, self.moment, math.log
+        users, random, end = len(user_ids), self.rng.random, self.end
+        for chunk in chunks(len(self.comment_posts)):
+            # Обсуждение затухает за несколько часов после поста:
+            # задержка распределена экспоненциально со средним в час.
+            self.rows += insert(Comment, fields, [
+                (post_ids[post], user_ids[int(random() * users)],
+                 f'Комментарий {i}',
+                 moment(min(post_times[post] - 3600 * log(1 - random()),
+                            end)))
+                for i, post in zip(chunk, self.comment_posts[
+                    chunk.start:chunk.stop])
+            ])
+
+    def create_timelines(self):
+        # Как timeline.backfill при подписке: последние BACKFILL_LIMIT
+        # постов автора, сколько бы у него ни было подписчиков.
+        n = len(self.user_ids)
+        fields = ('user', 'post', 'author', 'pub_date')
+        recent = {}
+        rows = []
+        for pair in self.follows:
+            user, author = divmod(pair, n)
+            if author not in recent:
+                recent[author] = [
+                    (self.post_ids[post], self.user_ids[author],
+                     self.post_moments[post])
+                    for post in self.posts_by_author.get(author, ())[
+                        -BACKFILL_LIMIT:]
+                ]
+            user_id = self.user_ids[user]
+            rows.extend((user_id, *entry) for entry in recent[author])
+            if len(rows) >= CHUNK_SIZE:
+                self.rows += insert(TimelineEntry, fields, rows)
+                rows = []
+        self.rows += insert(TimelineEntry, fields, rows)
+
+    def create_stats(self):
+        posts = array('q', [0]) * len(self.user_ids)
+        for author in self.post_authors:
+            posts[author] += 1
+        fields = ('user', 'post_count', 'follower_count', 'following_count')
+        for chunk in chunks(len(self.user_ids)):
+            # Ленты заполняются целиком, читать в обход них некого.
+            self.rows += insert(UserStats, fields, [
+                (self.user_ids[i], posts[i], self.followers[i],
+                 self.following[i])
+                for i in chunk
+            ], constants={'pull_on_read': False})
+
+
+def seed(users, groups, posts, follows, comments, random_seed=0,
+         images=0.0, days=365, until=None):
+    """Создаёт записи вместе с согласованными счётчиками и лентами
+    и возвращает число вставленных строк.
+
+    Посты распределяются за days дней до until (по умолчанию — сейчас).
+    """
+    return Seeder(random_seed, images, days, until).run(
+        users, groups, posts, follows, comments)
@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import timeline, versions
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def bump(user_id, **deltas):
+    # Счётчик, ушедший в ноль раньше времени, не уменьшается: строка
+    # не обновится и будет пересчитана целиком.
+    floors = {f'{field}__gte': -delta
+              for field, delta in deltas.items() if delta < 0}
+    updated = UserStats.objects.filter(user_id=user_id, **floors).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated:
+        # Строки нет и тогда, когда сам пользователь удаляется каскадом;
+        # после коммита станет ясно, есть ли что пересчитывать.
+        transaction.on_commit(lambda: recount(user_id))
+
+
+def recount(user_id):
+    if User.objects.filter(pk=user_id).exists():
+        UserStats.recount(user_id)
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+def bump_scopes(*posts):
+    """Поднимает версии лент-подписок, в которые попадает пост."""
+    authors = {author_id for author_id, _ in posts if author_id}
+    groups = {group_id for _, group_id in posts if group_id}
+    versions.bump_scopes(
+        'site',
+        *(f'author:{author_id}' for author_id in authors),
+        *(f'group:{group_id}' for group_id in groups),
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(instance.author_id, post_count=1)
+        timeline.fan_out(instance)
+    versions.bump_feed()
+    versions.bump_search()
+    # Пост, перенесённый к другому автору или в другую группу, должен
+    # уйти и из прежних лент.
+    scopes = (instance.author_id, instance.group_id)
+    bump_scopes(scopes, getattr(instance, '_loaded_scopes', scopes))
+    instance._loaded_scopes = scopes
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump(instance.author_id, post_count=-1)
+    versions.bump_feed()
+    versions.bump_search()
+    bump_scopes((instance.author_id, instance.group_id))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    versions.bump_feed()
+    versions.bump_scopes('site', f'group:{instance.pk}')
+
+
+# Комментарии двигают updated_at поста: это Last-Modified его страницы.
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1,
+            updated_at=timezone.now(),
+        )
+        versions.bump_feed()
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, 0),
+        updated_at=timezone.now(),
+    )
+    versions.bump_feed()
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(instance.author_id, follower_count=1)
+        bump(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        versions.bump_follow(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump(instance.author_id, follower_count=-1)
+    bump(instance.user_id, following_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    versions.bump_follow(instance.user_id)
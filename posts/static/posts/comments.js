@@ -0,0 +1,9 @@
+// Кнопка «Показать ещё» подгружает следующую страницу комментариев
+// фрагментом вместо перехода на страницу поста.
+$(document).on('click', '.comments-more', function (event) {
+    event.preventDefault();
+    var link = $(this);
+    $.get(link.data('fragment'), function (html) {
+        link.replaceWith(html);
+    });
+});
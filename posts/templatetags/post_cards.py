@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    card = context.template.engine.get_template(cards.TEMPLATE)
+    user = context.get('user')
+    html = cards.render(
+        list(posts), user,
+        lambda post: card.render(context.new({'post': post, 'user': user})),
+    )
+    return mark_safe(''.join(html))
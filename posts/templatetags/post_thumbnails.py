@@ -0,0 +1,27 @@
+import logging
+
+from django import template
+
+from posts import thumbnails
+
+logger = logging.getLogger(__name__)
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(post):
+    image = post.image
+    if not image:
+        return None
+    # Как и тег sorl, ошибки хранилища не должны ронять страницу.
+    try:
+        if hasattr(post, 'prefetched_thumbnail'):
+            thumbnail = post.prefetched_thumbnail
+        else:
+            thumbnail = thumbnails.ready(image)
+        if thumbnail is None:
+            thumbnails.submit(image.name)
+    except Exception:
+        logger.exception('Thumbnail lookup failed')
+        return None
+    return thumbnail
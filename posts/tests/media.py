@@ -0,0 +1,51 @@
+"""Общее для тестов с картинками: маленький GIF и временный MEDIA_ROOT."""
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def small_gif(name):
+    return SimpleUploadedFile(name, SMALL_GIF, 'image/gif')
+
+
+class TempMediaMixin:
+    """Свой MEDIA_ROOT на класс тестов; каталог удаляется после класса.
+
+    Подмена включается раньше setUpClass базового класса, поэтому
+    картинки из setUpClass и setUpTestData тоже попадают в него.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls._media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media_settings.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._cleanup_media()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            super().tearDownClass()
+        finally:
+            cls._cleanup_media()
+
+    @classmethod
+    def _cleanup_media(cls):
+        cls._media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
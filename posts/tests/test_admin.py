@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(5):
+            post = Post.objects.create(text=f'пост номер {i}',
+                                       author=cls.author)
+            Comment.objects.create(post=post, author=cls.reader, text='ок')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_changelists_without_full_count(self):
+        """Списки не считают всю таблицу и не делают запросов на строку"""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                response, queries = self.changelist(model)
+                self.assertFalse(
+                    any('COUNT(*)' in sql for sql in queries), queries)
+                self.assertLess(len(queries), 10)
+                self.assertGreater(
+                    len(response.context['cl'].result_list), 0)
+
+    def test_post_search_uses_index(self):
+        """Поиск постов идёт по полнотекстовому индексу"""
+        response, queries = self.changelist('post', q='номер 3')
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['пост номер 3'])
+        self.assertFalse(any('LIKE' in sql for sql in queries))
+
+    def test_username_filter_and_search(self):
+        """Фильтр и поиск по точному имени пользователя"""
+        response, _ = self.changelist('comment', author='reader')
+        self.assertEqual(len(response.context['cl'].result_list), 5)
+        response, _ = self.changelist('follow', q='author')
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+        response, _ = self.changelist('follow', user='author')
+        self.assertEqual(len(response.context['cl'].result_list), 0)
@@ -0,0 +1,104 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(title='Кино', slug='cinema',
+                                         description='О кино')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}',
+                                     first_name='Имя', last_name=str(i))
+            for i in range(5)
+        ]
+        for i in range(30):
+            Post.objects.create(text=f'пост {i}', author=cls.authors[i % 5],
+                                group=cls.group if i % 2 else None)
+        cls.post = Post.objects.latest('pub_date')
+        for i in range(3):
+            Comment.objects.create(post=cls.post, author=cls.authors[i],
+                                   text=f'комментарий {i}')
+
+    def test_posts_cursor_pagination(self):
+        """Список постов листается курсором до конца без повторов"""
+        url = reverse('api_posts') + '?limit=12'
+        texts = []
+        while url:
+            data = self.client.get(url).json()
+            texts += [item['text'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(texts, [f'пост {i}' for i in range(29, -1, -1)])
+
+    def test_invalid_cursor(self):
+        """Испорченный курсор даёт ошибку 400"""
+        for cursor in ('испорчен', 'eyJhIjoxfQ', 'WyJuZXh0IiwyLFsxXV0'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('api_posts'),
+                                           {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_page_batches_relations(self):
+        """Страница из 100 постов стоит трёх запросов"""
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('api_posts'),
+                                   {'limit': 100}).json()
+        self.assertEqual(len(queries), 3)
+        first = data['results'][0]
+        self.assertEqual(first['author'], {'username': 'author4',
+                                           'full_name': 'Имя 4'})
+        self.assertEqual(first['group'], {'slug': 'cinema', 'title': 'Кино'})
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только нужные поля и не грузит связи"""
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('api_posts'),
+                                   {'fields': 'id,text'}).json()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        response = self.client.get(reverse('api_posts'), {'fields': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters_and_details(self):
+        """Фильтры по группе и автору, детали поста, группы и профиля"""
+        data = self.client.get(reverse('api_posts'), {
+            'group': 'cinema', 'author': 'author1', 'fields': 'text'}).json()
+        self.assertEqual(len(data['results']), 3)
+        post = self.client.get(reverse('api_post', kwargs={
+            'post_id': self.post.id})).json()
+        self.assertEqual(post['comment_count'], 3)
+        group = self.client.get(reverse('api_group', kwargs={
+            'slug': 'cinema'})).json()
+        self.assertEqual(group['description'], 'О кино')
+        missing = self.client.get(reverse('api_group', kwargs={
+            'slug': 'missing'}))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_comments(self):
+        """Комментарии поста отдаются от новых к старым с авторами"""
+        data = self.client.get(reverse('api_post_comments', kwargs={
+            'post_id': self.post.id})).json()
+        self.assertEqual(
+            [item['author']['username'] for item in data['results']],
+            ['author2', 'author1', 'author0'],
+        )
+
+    def test_profile(self):
+        """Профиль отдаёт счётчики и подписку зрителя"""
+        Follow.objects.create(user=self.authors[0], author=self.authors[1])
+        self.client.force_login(self.authors[0])
+        data = self.client.get(reverse('api_profile', kwargs={
+            'username': 'author1'})).json()
+        self.assertEqual(data['post_count'], 6)
+        self.assertEqual(data['follower_count'], 1)
+        self.assertTrue(data['following'])
+
+    def test_read_only(self):
+        """API не принимает запись"""
+        response = self.client.post(reverse('api_posts'), {'text': 'new'})
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import cards, thumbnails
+from posts.models import Comment, Group, Post, User
+from posts.tests.media import TempMediaMixin, small_gif
+
+
+class PostCardCacheTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(text='card', author=self.author)
+        self.profile = reverse('profile', kwargs={'username': 'author'})
+
+    def test_feed_uses_cached_card(self):
+        """Лента собирается из закешированных карточек"""
+        self.client.get(self.profile)
+        cache.set(cards.key(self.post, self.reader), 'cached card')
+        self.client.force_login(self.reader)
+        self.assertContains(self.client.get(self.profile), 'cached card')
+
+    def test_key_follows_post_and_viewer(self):
+        """Ключ меняется с правкой поста, комментариями и ролью зрителя"""
+        keys = {cards.key(self.post, self.author),
+                cards.key(self.post, self.reader)}
+        self.post.text = 'edited'
+        self.post.save()
+        keys.add(cards.key(self.post, self.reader))
+        Comment.objects.create(post=self.post, author=self.reader, text='c')
+        self.post.refresh_from_db()
+        keys.add(cards.key(self.post, self.reader))
+        self.assertEqual(len(keys), 4)
+
+    def test_group_rename_reaches_card(self):
+        """Новое название группы сразу попадает в карточку"""
+        group = Group.objects.create(title='Старое', slug='news')
+        self.post.group = group
+        self.post.save()
+        self.assertContains(self.client.get(self.profile), 'Старое')
+        group.title = 'Новое название'
+        group.save()
+        response = self.client.get(self.profile)
+        self.assertContains(response, 'Новое название')
+        self.assertNotContains(response, 'Старое')
+
+    def test_edit_link_only_for_author(self):
+        """Автор и читатель получают разные карточки"""
+        self.client.force_login(self.reader)
+        self.assertNotContains(self.client.get(self.profile), 'Редактировать')
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(self.profile), 'Редактировать')
+
+    def test_pending_thumbnail_not_cached(self):
+        """Карточка с неготовой миниатюрой не кешируется"""
+        post = Post.objects.create(
+            text='image', author=self.author,
+            image=small_gif('card.gif'),
+        )
+        with mock.patch.object(thumbnails, 'submit'):
+            self.client.get(self.profile)
+        self.assertIsNone(cache.get(cards.key(post, None)))
+        self.assertIsNotNone(cache.get(cards.key(self.post, None)))
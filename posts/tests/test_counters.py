@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        """Создание поста и комментария увеличивает счётчики"""
+        self.author_client.post(reverse('new_post'), {'text': 'test_post'})
+        post = Post.objects.get()
+        self.reader_client.post(
+            reverse('add_comment', kwargs={
+                'username': 'author', 'post_id': post.id}),
+            {'text': 'comment'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).post_count, 1)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей"""
+        url_kwargs = {'username': 'author'}
+        self.reader_client.get(reverse('profile_follow', kwargs=url_kwargs))
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.reader_client.get(reverse('profile_unfollow', kwargs=url_kwargs))
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_cascade_delete_updates_counters(self):
+        """Каскадное удаление уменьшает счётчики"""
+        post = Post.objects.create(text='test_post', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='text')
+        post.delete()
+        self.assertEqual(self.stats(self.author).post_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_counters исправляет расхождения"""
+        post = Post.objects.create(text='test_post', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='text')
+        Post.objects.update(comment_count=7)
+        UserStats.objects.filter(user=self.author).update(post_count=5)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.reader).post_count, 0)
+
+
+class UserDeletionTest(TransactionTestCase):
+    def test_deleted_user_leaves_no_stats(self):
+        """Удаление автора с постами не оставляет осиротевших счётчиков"""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Post.objects.create(text='test_post', author=author)
+        Follow.objects.create(user=reader, author=author)
+        author.delete()
+        self.assertEqual(list(UserStats.objects.values_list(
+            'user_id', 'following_count')), [(reader.id, 0)])
@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import exporting
+from posts.models import Comment, Follow, Post, User
+from posts.tests.media import SMALL_GIF, TempMediaMixin, small_gif
+
+
+def read_table(archive, name):
+    with archive.open(f'{name}.jsonl') as table:
+        return [json.loads(line) for line in table]
+
+
+class ExportTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='owner')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(
+            text='с картинкой', author=cls.user,
+            image=small_gif('export.gif'),
+        )
+        Post.objects.create(text='чужой', author=cls.other)
+        Comment.objects.create(post=cls.post, author=cls.other, text='ого')
+        Follow.objects.create(user=cls.other, author=cls.user)
+
+    def test_user_archive(self):
+        """Архив пользователя содержит его данные и оригиналы картинок"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('export_data'))
+        self.assertTrue(response.streaming)
+        self.assertIn('yatube-owner.zip', response['Content-Disposition'])
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(read_table(archive, 'profile')[0]['username'],
+                         'owner')
+        self.assertEqual([post['text']
+                          for post in read_table(archive, 'posts')],
+                         ['с картинкой'])
+        self.assertEqual(read_table(archive, 'comments'), [])
+        self.assertEqual(read_table(archive, 'follows'),
+                         [{'user': 'other', 'author': 'owner'}])
+        self.assertEqual(archive.read(f'media/{self.post.image.name}'),
+                         SMALL_GIF)
+
+    def test_archive_requires_login(self):
+        """Выгрузка доступна только вошедшему пользователю"""
+        response = self.client.get(reverse('export_data'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_command(self):
+        """Команда пишет весь сайт в ZIP и отдельные таблицы в NDJSON"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'site.zip')
+        call_command('export_yatube', path)
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(len(read_table(archive, 'posts')), 2)
+            self.assertIn(f'media/{self.post.image.name}',
+                          archive.namelist())
+        path = os.path.join(directory, 'comments.jsonl')
+        call_command('export_yatube', path, kind='comments')
+        with open(path, encoding='utf-8') as table:
+            comment = json.loads(table.readline())
+        self.assertEqual(comment['post'], self.post.pk)
+        self.assertEqual(comment['author'], 'other')
+
+    def test_images_round_trip(self):
+        """import_yatube восстанавливает картинки из media/ архива"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'site.zip')
+        call_command('export_yatube', path)
+        with zipfile.ZipFile(path) as archive:
+            archive.extractall(directory)
+        Post.objects.all().delete()
+        call_command('import_yatube', os.path.join(directory, 'posts.jsonl'),
+                     kind='posts', media=os.path.join(directory, 'media'),
+                     stdout=io.StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        with post.image.open() as image:
+            self.assertEqual(image.read(), SMALL_GIF)
+        self.assertEqual(post.image_hash, self.post.image_hash)
+        self.assertFalse(Post.objects.exclude(pk=self.post.pk).exclude(
+            image='').exists())
+
+    def test_stream_is_chunked(self):
+        """Архив отдаётся частями, а не одним куском"""
+        records = ({'text': os.urandom(100).hex()} for _ in range(5000))
+        chunks = list(exporting.zip_stream({'posts': records}))
+        self.assertGreater(len(chunks), 2)
+        self.assertLessEqual(max(map(len, chunks)),
+                             exporting.FLUSH_SIZE * 2)
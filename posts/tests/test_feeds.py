@@ -0,0 +1,106 @@
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Кино', slug='cinema',
+                                         description='О кино')
+        cls.empty = Group.objects.create(title='Пусто', slug='empty',
+                                         description='')
+        Post.objects.create(text='про кино', author=cls.author,
+                            group=cls.group)
+        Post.objects.create(text='без группы', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+
+    def body(self, response):
+        return b''.join(response.streaming_content
+                        if response.streaming else [response.content])
+
+    def test_formats(self):
+        """Лента сайта доступна в RSS, Atom и JSON Feed"""
+        rss = self.client.get(reverse('feed', kwargs={'format': 'rss'}))
+        self.assertIn(b'<rss', self.body(rss))
+        atom = self.client.get(reverse('feed', kwargs={'format': 'atom'}))
+        self.assertIn(b'xmlns="http://www.w3.org/2005/Atom"', self.body(atom))
+        response = self.client.get(reverse('feed', kwargs={'format': 'json'}))
+        self.assertEqual(response['Content-Type'],
+                         'application/feed+json; charset=utf-8')
+        items = json.loads(self.body(response))['items']
+        self.assertEqual([item['content_text'] for item in items],
+                         ['без группы', 'про кино'])
+
+    def test_scopes(self):
+        """Ленты группы и автора содержат только свои посты"""
+        for name, kwargs in (('group_feed', {'slug': 'cinema'}),
+                             ('author_feed', {'username': 'author'})):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, kwargs={
+                    'format': 'json', **kwargs}))
+                items = json.loads(self.body(response))['items']
+                self.assertEqual([item['content_text'] for item in items],
+                                 ['про кино'])
+        response = self.client.get(reverse('group_feed', kwargs={
+            'format': 'rss', 'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_until_scope_changes(self):
+        """Лента отдаётся из кеша, пока посты её области не изменятся"""
+        url = reverse('group_feed', kwargs={'format': 'rss',
+                                            'slug': 'cinema'})
+        first = self.client.get(url)
+        self.body(first)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        # Только поиск группы по slug.
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.status_code, 200)
+        Post.objects.create(text='в другой области', author=self.other)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='новое про кино', author=self.other,
+                            group=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertIn('новое про кино'.encode(), self.body(response))
+
+    def test_moved_post_leaves_old_group(self):
+        """Пост, перенесённый в другую группу, пропадает из старой ленты"""
+        url = reverse('group_feed', kwargs={'format': 'json',
+                                            'slug': 'cinema'})
+        self.body(self.client.get(url))
+        post = Post.objects.get(group=self.group)
+        post.group = self.empty
+        post.save()
+        items = json.loads(self.body(self.client.get(url)))['items']
+        self.assertEqual(items, [])
+
+    def test_save_does_not_reread_post(self):
+        """Сохранение загруженного поста не перечитывает его строку"""
+        post = Post.objects.get(group=self.group)
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertFalse([query for query in queries
+                          if query['sql'].startswith('SELECT')])
+
+    def test_renamed_author_keeps_feed_fresh(self):
+        """Переименованный автор получает свежую ленту после нового поста"""
+        url = reverse('author_feed', kwargs={'format': 'json',
+                                             'username': 'renamed'})
+        self.author.username = 'renamed'
+        self.author.save()
+        self.body(self.client.get(url))
+        Post.objects.create(text='после переименования', author=self.author)
+        items = json.loads(self.body(self.client.get(url)))['items']
+        self.assertEqual(items[0]['content_text'], 'после переименования')
@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import importing
+from posts.models import (Comment, Follow, Group, ImportCheckpoint, Post,
+                          TimelineEntry, User, UserStats)
+
+
+class ImportTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def jsonl(self, name, records):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def load(self, path, kind, **options):
+        call_command('import_yatube', path, kind=kind, chunk_size=2,
+                     stdout=open(os.devnull, 'w'), **options)
+
+    def test_posts_keep_dates_and_create_authors(self):
+        """Посты сохраняют даты, авторы и группы создаются по именам"""
+        path = self.jsonl('posts.jsonl', [
+            {'id': 1, 'author': 'ann', 'text': 'первый',
+             'pub_date': '2020-01-02T03:04:05', 'group': 'news'},
+            {'id': 2, 'author': 'bob', 'text': 'второй'},
+            {'id': 3, 'author': 'ann'},
+            {'id': 4, 'author': 'ann', 'text': 'третий'},
+        ])
+        self.load(path, 'posts', id_offset=100)
+        post = Post.objects.get(pk=101)
+        self.assertEqual(post.pub_date.isoformat(),
+                         '2020-01-02T03:04:05+00:00')
+        self.assertEqual(post.updated_at, post.pub_date)
+        self.assertEqual(post.group, Group.objects.get(slug='news'))
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(UserStats.objects.get(
+            user__username='ann').post_count, 2)
+
+    def test_comments_from_csv(self):
+        """Комментарии из CSV обновляют счётчик, чужие посты пропускаются"""
+        author = User.objects.create_user(username='ann')
+        post = Post.objects.create(text='пост', author=author)
+        path = os.path.join(self.directory.name, 'comments.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output)
+            writer.writerow(['post', 'author', 'text', 'created'])
+            writer.writerow([post.pk, 'bob', 'привет', '2021-05-06 07:08'])
+            writer.writerow([post.pk + 1, 'bob', 'мимо', ''])
+        self.load(path, 'comments')
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author.username, 'bob')
+        self.assertEqual(comment.created.year, 2021)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_timelines(self):
+        """Подписки и посты попадают в ленты в любом порядке загрузки"""
+        self.load(self.jsonl('posts.jsonl', [
+            {'author': 'ann', 'text': 'до подписки'},
+        ]), 'posts')
+        self.load(self.jsonl('follows.jsonl', [
+            {'user': 'bob', 'author': 'ann'},
+            {'user': 'bob', 'author': 'bob'},
+            {'user': 'bob', 'author': 'ann'},
+        ]), 'follows')
+        self.load(self.jsonl('more.jsonl', [
+            {'author': 'ann', 'text': 'после подписки'},
+        ]), 'posts')
+        self.assertEqual(Follow.objects.count(), 1)
+        bob = User.objects.get(username='bob')
+        self.assertEqual(
+            sorted(entry.post.text
+                   for entry in TimelineEntry.objects.filter(user=bob)),
+            ['до подписки', 'после подписки'],
+        )
+        self.assertEqual(UserStats.objects.get(user=bob).following_count, 1)
+
+    def test_resume_after_failure(self):
+        """Прерванная загрузка продолжается без дублей"""
+        path = self.jsonl('posts.jsonl', [
+            {'author': 'ann', 'text': str(number)} for number in range(6)
+        ])
+        original = importing.Importer.posts
+        calls = []
+
+        def failing(importer, records):
+            calls.append(records)
+            if len(calls) == 2:
+                raise RuntimeError('обрыв')
+            return original(importer, records)
+
+        with mock.patch.object(importing.Importer, 'posts', failing):
+            with self.assertRaises(RuntimeError):
+                self.load(path, 'posts')
+        self.assertEqual(ImportCheckpoint.objects.get().position, 2)
+        self.load(path, 'posts')
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [str(number) for number in range(6)],
+        )
+        self.assertEqual(UserStats.objects.get(
+            user__username='ann').post_count, 6)
+
+    def test_recounts_only_touched_rows(self):
+        """Пересчитываются только посты и пользователи из загрузки"""
+        other = User.objects.create_user(username='other')
+        Post.objects.create(text='чужой', author=other)
+        UserStats.objects.filter(user=other).update(post_count=100)
+        Post.objects.filter(author=other).update(comment_count=100)
+        self.load(self.jsonl('posts.jsonl', [
+            {'id': 1000, 'author': 'ann', 'text': 'первый'},
+        ]), 'posts')
+        self.load(self.jsonl('comments.jsonl', [
+            {'post': 1000, 'author': 'bob', 'text': 'ок'},
+        ]), 'comments')
+        self.assertEqual(UserStats.objects.get(user=other).post_count, 100)
+        self.assertEqual(
+            Post.objects.get(author=other).comment_count, 100)
+        self.assertEqual(UserStats.objects.get(
+            user__username='ann').post_count, 1)
+        self.assertTrue(UserStats.objects.filter(
+            user__username='bob').exists())
+        self.assertEqual(Post.objects.get(pk=1000).comment_count, 1)
+
+    def test_follows_backfill_popular_authors(self):
+        """Подписка на популярного автора заполняет ленту, как на сайте"""
+        self.load(self.jsonl('posts.jsonl', [
+            {'author': 'ann', 'text': 'старый пост'},
+        ]), 'posts')
+        with mock.patch.object(importing, 'FANOUT_LIMIT', 0):
+            self.load(self.jsonl('follows.jsonl', [
+                {'user': 'bob', 'author': 'ann'},
+            ]), 'follows')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='bob', post__text='старый пост').exists())
+
+    def test_skipped_fan_out_marks_author(self):
+        """Автор, чьи посты не разложены по лентам, читается в обход них"""
+        self.load(self.jsonl('follows.jsonl', [
+            {'user': 'bob', 'author': 'ann'},
+        ]), 'follows')
+        with mock.patch.object(importing, 'FANOUT_LIMIT', 0):
+            self.load(self.jsonl('posts.jsonl', [
+                {'author': 'ann', 'text': 'горячий пост'},
+            ]), 'posts')
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__text='горячий пост').exists())
+        stats = UserStats.objects.get(user__username='ann')
+        self.assertTrue(stats.pull_on_read)
+        self.assertEqual(stats.post_count, 1)
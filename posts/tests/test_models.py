@@ -1,6 +1,11 @@
+import hashlib
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
 from posts.models import Comment, Group, Post, User
+from posts.tests.media import SMALL_GIF, TempMediaMixin, small_gif
 
 
 class PostModelTest(TestCase):
@@ -104,3 +109,37 @@ class CommentModelTest(TestCase):
         help_text = comment._meta.get_field('text').help_text
         self.assertEquals(help_text, 'Напишите ваш комментарий'
                                      'в соотвествии с правилами сообщества')
+
+
+class PostImageMetaTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='test_post',
+            author=User.objects.create_user(username='test_user'),
+            image=small_gif('meta.gif'),
+        )
+
+    def assert_meta(self, post):
+        expected = {
+            'image_width': 2,
+            'image_height': 1,
+            'image_format': 'GIF',
+            'image_size': len(SMALL_GIF),
+            'image_hash': hashlib.sha256(SMALL_GIF).hexdigest(),
+        }
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(post, field), value)
+
+    def test_meta_saved_on_upload(self):
+        """Метаданные картинки сохраняются при загрузке"""
+        self.assert_meta(Post.objects.get(pk=self.post.pk))
+
+    def test_backfill_image_meta(self):
+        """Команда backfill_image_meta заполняет пустые метаданные"""
+        Post.objects.update(image_width=None, image_height=None,
+                            image_format='', image_size=None, image_hash='')
+        call_command('backfill_image_meta', stdout=StringIO())
+        self.assert_meta(Post.objects.get(pk=self.post.pk))
@@ -0,0 +1,102 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+FEED_TABLES = ('posts_post', 'posts_comment', 'posts_follow',
+               'posts_timelineentry')
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+class QueryPlanTest(TestCase):
+    """Запросы страниц идут по индексам, без полного просмотра таблиц."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='group', slug='group')
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(3)]
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(40):
+            post = Post.objects.create(
+                text=f'post {i}', author=cls.authors[i % 3],
+                group=cls.group if i % 2 else None,
+            )
+            Comment.objects.create(post=post, author=cls.reader, text='ok')
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, queries, statements=('SELECT',)):
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith(statements) or not any(
+                        f'"{table}"' in sql for table in FEED_TABLES):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans[sql] = [row[3] for row in cursor.fetchall()]
+        return plans
+
+    def assertIndexed(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        plans = self.plans(queries)
+        self.assertNoFullScans(plans)
+        for sql, plan in plans.items():
+            # Сортировка во временном дереве допустима, только если
+            # выборка ограничена диапазоном по индексу.
+            if 'USE TEMP B-TREE FOR ORDER BY' in plan:
+                self.assertTrue(any('>?' in step for step in plan),
+                                f'{sql}\n{plan}')
+        return response
+
+    def assertNoFullScans(self, plans):
+        self.assertTrue(plans)
+        for sql, plan in plans.items():
+            for step in plan:
+                match = FULL_SCAN.match(step)
+                self.assertFalse(match and match.group(1) in FEED_TABLES,
+                                 f'{sql}\n{plan}')
+
+    def test_feed_pages(self):
+        """Ленты главной, группы, профиля и подписок"""
+        urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': 'group'}),
+            reverse('profile', kwargs={'username': 'author0'}),
+            reverse('follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.assertIndexed(url)
+                cursor = response.context['page'].next_cursor
+                self.assertIsNotNone(cursor)
+                cache.clear()
+                self.assertIndexed(url, {'cursor': cursor})
+                cache.clear()
+                self.assertIndexed(url, {'page': 2})
+
+    def test_post_page(self):
+        """Страница поста с комментариями"""
+        self.assertIndexed(reverse('post', kwargs={
+            'username': self.post.author.username, 'post_id': self.post.id}))
+
+    def test_user_deletion(self):
+        """Каскадное удаление автора находит его строки по индексам"""
+        with CaptureQueriesContext(connection) as queries:
+            self.authors[0].delete()
+        self.assertNoFullScans(self.plans(queries, ('SELECT', 'DELETE')))
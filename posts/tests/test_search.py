@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search, versions, views
+from posts.models import Comment, Post, User
+from posts.search import MARK_END, MARK_START
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, text):
+        return list(Post.objects.search(text).values_list('text', flat=True))
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при создании, правке и удалении поста"""
+        post = Post.objects.create(text='Первый снег', author=self.author)
+        self.assertEqual(self.found('снег'), ['Первый снег'])
+        post.text = 'Первый дождь'
+        post.save()
+        self.assertEqual(self.found('снег'), [])
+        self.assertEqual(self.found('дождь'), ['Первый дождь'])
+        post.delete()
+        self.assertEqual(self.found('дождь'), [])
+
+    def test_prefix_and_operators(self):
+        """Последнее слово ищется по префиксу, операторы FTS экранируются"""
+        Post.objects.create(text='Котики и собаки', author=self.author)
+        self.assertEqual(self.found('кот'), ['Котики и собаки'])
+        self.assertEqual(self.found('NOT "котики'), [])
+        self.assertEqual(self.found('!!!'), [])
+
+    def test_rank_and_snippet(self):
+        """Результаты упорядочены по релевантности и подсвечены"""
+        Post.objects.create(text='чай ' + 'слово ' * 20, author=self.author)
+        Post.objects.create(text='чай чай', author=self.author)
+        response = self.client.get(reverse('search'), {'q': 'чай'})
+        page = response.context['page']
+        self.assertEqual(page[0].text, 'чай чай')
+        self.assertIn(MARK_START + 'чай' + MARK_END, page[0].snippet)
+        self.assertContains(response, '<mark>чай</mark>')
+
+    def test_pages_hold_results(self):
+        """Страницы выдачи режутся из одного списка, пока посты меняются"""
+        for i in range(views.POSTS_PER_PAGE + 3):
+            Post.objects.create(text=f'лес {i}', author=self.author)
+        first = self.client.get(reverse('search'), {'q': 'лес'})
+        version = first.context['version']
+        self.assertContains(
+            first, f'q=%D0%BB%D0%B5%D1%81&amp;v={version}&amp;page=2')
+        Post.objects.create(text='лес лес лес', author=self.author)
+        second = self.client.get(
+            reverse('search'), {'q': 'лес', 'v': version, 'page': 2})
+        ids = [post.id for post in first.context['page']]
+        ids += [post.id for post in second.context['page']]
+        self.assertEqual(len(ids), views.POSTS_PER_PAGE + 3)
+        self.assertEqual(len(set(ids)), len(ids))
+        fresh = self.client.get(reverse('search'), {'q': 'лес'})
+        self.assertEqual(fresh.context['page'][0].text, 'лес лес лес')
+
+    def test_chunks_are_read_on_demand(self):
+        """Куски выдачи читаются по мере листания и стыкуются без потерь"""
+        for i in range(25):
+            Post.objects.create(text=f'поле {i}', author=self.author)
+        expected = list(Post.objects.search('поле').order_by(
+            '-score', '-id').values_list('id', flat=True))
+        ids = []
+        with mock.patch.object(search, 'CHUNK_SIZE', 15):
+            for number in (1, 2, 3):
+                response = self.client.get(
+                    reverse('search'), {'q': 'поле', 'page': number})
+                ids += [post.id for post in response.context['page']]
+        self.assertEqual(ids, expected)
+        self.assertFalse(response.context['page'].has_next())
+
+    def test_results_capped(self):
+        """Дальше MAX_RESULTS выдача не листается и говорит об этом"""
+        for i in range(25):
+            Post.objects.create(text=f'море {i}', author=self.author)
+        with mock.patch.object(views, 'MAX_RESULTS', 20):
+            first = self.client.get(reverse('search'), {'q': 'море'})
+            last = self.client.get(
+                reverse('search'), {'q': 'море', 'page': 5})
+        self.assertTrue(first.context['page'].has_next())
+        self.assertNotContains(first, 'найдено больше')
+        self.assertEqual(last.context['page'].number, 2)
+        self.assertFalse(last.context['page'].has_next())
+        self.assertContains(last, 'Показаны первые 20 результатов')
+
+    def test_snapshot_survives_comments(self):
+        """Комментарии не сбрасывают запомненную выдачу"""
+        post = Post.objects.create(text='река', author=self.author)
+        version = versions.search()
+        Comment.objects.create(post=post, author=self.author, text='да')
+        self.assertEqual(versions.search(), version)
+        post.text = 'река и берег'
+        post.save()
+        self.assertNotEqual(versions.search(), version)
+
+    def test_profile_named_search(self):
+        """Поиск не занимает адрес профиля пользователя search"""
+        User.objects.create_user(username='search')
+        response = self.client.get(reverse('profile', args=['search']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['author'].username, 'search')
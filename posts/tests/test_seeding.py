@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import Max
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from posts import seeding
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class SeedTest(TransactionTestCase):
+    counts = {'users': 50, 'groups': 2, 'posts': 300, 'follows': 200,
+              'comments': 400}
+
+    def snapshot(self):
+        return list(Post.objects.order_by('pub_date', 'id').values_list(
+            'author__username', 'group__slug', 'text', 'pub_date',
+            'comment_count'))
+
+    def test_seed_keeps_counters_and_timelines(self):
+        """Сгенерированные данные согласованы со счётчиками и лентами"""
+        rows = seeding.seed(**self.counts)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Follow.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 400)
+        self.assertEqual(rows, 50 + 2 + 300 + 200 + 400 + 50
+                         + TimelineEntry.objects.count())
+        for user in User.objects.select_related('stats'):
+            self.assertEqual(user.stats.post_count, user.posts.count())
+            self.assertEqual(user.stats.follower_count,
+                             user.following.count())
+        for post in Post.objects.all():
+            self.assertEqual(post.comment_count, post.comments.count())
+        expected = sum(follow.author.posts.count()
+                       for follow in Follow.objects.all())
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+        self.assertEqual(len(Post.objects.search('Пост')), 300)
+
+    def test_follower_counts_are_skewed(self):
+        """Подписчики распределены по степенному закону"""
+        seeding.seed(**self.counts)
+        top = User.objects.aggregate(top=Max('stats__follower_count'))['top']
+        self.assertGreater(top, 5 * 200 / 50)
+
+    def test_same_seed_same_data(self):
+        """Одинаковый random_seed даёт одинаковые данные"""
+        until = timezone.now()
+        seeding.seed(random_seed=7, until=until, **self.counts)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        seeding.seed(random_seed=7, until=until, **self.counts)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_stub_images_get_metadata(self):
+        """Посты с картинкой-заглушкой получают её метаданные"""
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media):
+            seeding.seed(images=0.5, **self.counts)
+        pictured = Post.objects.exclude(image='')
+        self.assertTrue(pictured.exists())
+        self.assertFalse(pictured.filter(image_width=None).exists())
+        self.assertFalse(Post.objects.filter(image='').exclude(
+            image_width=None).exists())
+
+    def test_other_backends_are_refused(self):
+        """Команда отказывается работать не с SQLite"""
+        with mock.patch(
+                'posts.management.commands.seed_yatube.connection') as db:
+            db.vendor = 'postgresql'
+            with self.assertRaises(CommandError):
+                call_command('seed_yatube', users=1)
+        self.assertFalse(User.objects.exists())
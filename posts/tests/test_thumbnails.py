@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import Future
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, User
+from posts.tests.media import TempMediaMixin, small_gif
+
+
+class ThumbnailTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='test_post',
+            author=User.objects.create_user(username='test_user'),
+            image=small_gif('thumb.gif'),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_submit_generates_thumbnail(self):
+        """После генерации миниатюра берётся из key-value store"""
+        self.assertIsNone(thumbnails.ready(self.post.image))
+        thumbnails.submit(self.post.image.name)
+        thumbnail = thumbnails.ready(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(list(thumbnail.size), [960, 339])
+
+    def test_feed_shows_placeholder_until_ready(self):
+        """Пока миниатюры нет, лента показывает заглушку"""
+        with mock.patch.object(thumbnails, 'submit') as submit:
+            response = self.client.get(reverse('index'))
+        submit.assert_called_once_with(self.post.image.name)
+        self.assertNotContains(response, '<img class="card-img"')
+        thumbnails.generate(self.post.image.name)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<img class="card-img"')
+
+    def test_page_thumbnails_are_fetched_in_one_query(self):
+        """Записи key-value store для страницы читаются одним запросом"""
+        author = User.objects.get(username='test_user')
+        thumbnails.generate(self.post.image.name)
+        for number in range(3):
+            post = Post.objects.create(
+                text=f'test_post_{number}',
+                author=author,
+                image=small_gif(f'thumb_{number}.gif'),
+            )
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertContains(response, '<img class="card-img"', count=4)
+
+
+@override_settings(THUMBNAIL_WORKERS=1)
+class ThumbnailPoolTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(self.shutdown_pool)
+
+    @staticmethod
+    def shutdown_pool():
+        if thumbnails._executor is not None:
+            thumbnails._executor.shutdown()
+            thumbnails._executor = None
+
+    def test_pool_runs_in_worker_process(self):
+        """Пул запускает задачи в отдельном процессе с настроенным Django"""
+        pool = thumbnails._pool()
+        self.assertIs(thumbnails._pool(), pool)
+        worker = pool.submit(os.getpid).result(timeout=60)
+        self.assertNotEqual(worker, os.getpid())
+
+    def test_submit_dispatches_to_pool(self):
+        """При THUMBNAIL_WORKERS > 0 генерация уходит в пул один раз"""
+        with mock.patch.object(thumbnails, '_pool') as pool:
+            thumbnails.submit('posts/pool.gif')
+            thumbnails.submit('posts/pool.gif')
+        pool.return_value.submit.assert_called_once_with(
+            thumbnails.generate, 'posts/pool.gif')
+        future = pool.return_value.submit.return_value
+        future.add_done_callback.assert_called_once_with(thumbnails._report)
+
+    def test_failed_task_is_logged(self):
+        """Ошибка в процессе пула попадает в лог"""
+        future = Future()
+        future.set_exception(OSError('broken image'))
+        with self.assertLogs('posts.thumbnails', 'ERROR') as logs:
+            thumbnails._report(future)
+        self.assertIn('Thumbnail generation failed', logs.output[0])
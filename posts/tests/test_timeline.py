@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, User, UserStats
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Post.objects.create(text='old_post', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self):
+        self.reader_client.get(
+            reverse('profile_follow', kwargs={'username': 'author'}))
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка её очищает"""
+        self.follow()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 1)
+        self.reader_client.get(
+            reverse('profile_unfollow', kwargs={'username': 'author'}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков при записи"""
+        self.follow()
+        self.author_client.post(reverse('new_post'), {'text': 'new_post'})
+        post = Post.objects.get(text='new_post')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post, pub_date=post.pub_date).exists())
+
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        self.follow()
+        with mock.patch.object(timeline, 'FANOUT_LIMIT', 0):
+            self.author_client.post(reverse('new_post'), {'text': 'hot'})
+            post = Post.objects.get(text='hot')
+            self.assertFalse(
+                TimelineEntry.objects.filter(post=post).exists())
+            response = self.reader_client.get(reverse('follow_index'))
+        self.assertEqual(response.context['page'][0], post)
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_unfollows_keep_pulled_posts(self):
+        """Неразложенные посты не пропадают, когда подписчиков стало мало"""
+        self.follow()
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.author)
+        with mock.patch.object(timeline, 'FANOUT_LIMIT', 1):
+            self.author_client.post(reverse('new_post'), {'text': 'hot'})
+            Follow.objects.filter(user=other).delete()
+            post = Post.objects.get(text='hot')
+            self.assertFalse(
+                TimelineEntry.objects.filter(post=post).exists())
+            response = self.reader_client.get(reverse('follow_index'))
+        self.assertEqual(response.context['page'][0], post)
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_merged_feed_pages_by_cursor(self):
+        """Слитая лента листается курсором без пропусков и повторов"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        for number in range(12):
+            Post.objects.create(text=f'post_{number}',
+                                author=(self.author, other)[number % 2])
+        url = reverse('follow_index')
+        with mock.patch.object(timeline, 'FANOUT_LIMIT', 0):
+            UserStats.objects.filter(user=other).update(follower_count=0)
+            first = self.reader_client.get(url).context['page']
+            second = self.reader_client.get(
+                url, {'cursor': first.next_cursor}).context['page']
+        texts = [post.text for post in [*first, *second]]
+        expected = [f'post_{number}' for number in range(11, -1, -1)]
+        self.assertEqual(texts, [*expected, 'old_post'])
+
+    def test_follow_feed_read_does_not_write(self):
+        """Чтение ленты подписок ничего не пишет в базу"""
+        self.follow()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(reverse('follow_index'))
+        self.assertEqual(response.context['page'][0].text, 'old_post')
+        self.assertFalse(any(
+            query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+            for query in queries))
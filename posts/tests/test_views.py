@@ -5,11 +5,13 @@ import tempfile
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django import forms
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Group, Follow, Post, User
+from posts.models import Comment, Group, Follow, Post, User
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -365,6 +367,46 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(
                     response.context.get(context_name).object_list), 3)
 
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и обратно на первую страницу"""
+        page_names = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': 'test'}),
+            reverse('profile', kwargs={'username': 'test_user'}),
+        )
+        for reverse_name in page_names:
+            with self.subTest(reverse_name=reverse_name):
+                first = self.client.get(reverse_name).context['page']
+                self.assertIsNone(first.previous_cursor)
+                second = self.client.get(
+                    reverse_name, {'cursor': first.next_cursor}
+                ).context['page']
+                self.assertEqual(len(second.object_list), 3)
+                self.assertEqual(second.number, 2)
+                self.assertIsNone(second.next_cursor)
+                back = self.client.get(
+                    reverse_name, {'cursor': second.previous_cursor}
+                ).context['page']
+                self.assertEqual(
+                    [post.id for post in back.object_list],
+                    [post.id for post in first.object_list],
+                )
+                self.assertFalse(back.has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору не выполняет COUNT(*)"""
+        first = self.client.get(reverse('index')).context['page']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('index'), {'cursor': first.next_cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(*)', query['sql'])
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор отдаёт первую страницу"""
+        response = self.client.get(reverse('index'), {'cursor': 'broken!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page'].number, 1)
+
 
 class CacheTest(TestCase):
     @classmethod
@@ -381,14 +423,14 @@ class CacheTest(TestCase):
             group=cls.group,
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_cache_index_page(self):
+        """Главная страница отдаётся из кеша, пока лента не изменилась"""
         response_before = self.client.get(reverse('index'))
         content_before = response_before.content
-        Post.objects.create(
-            text='test_post_second',
-            author=self.user,
-            group=self.group,
-        )
+        Post.objects.filter(text='test_post').update(text='test_changed')
         response_after = self.client.get(reverse('index'))
         content_after = response_after.content
         cache.clear()
@@ -396,3 +438,204 @@ class CacheTest(TestCase):
         content_after_clear = response_after_clear.content
         self.assertEqual(content_before, content_after)
         self.assertNotEqual(content_before, content_after_clear)
+
+    def test_new_post_invalidates_index_cache(self):
+        """Новый пост сразу виден на закешированной главной"""
+        self.client.get(reverse('index'))
+        Post.objects.create(
+            text='test_post_second',
+            author=self.user,
+            group=self.group,
+        )
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'test_post_second')
+
+    def test_follow_cache_is_per_user(self):
+        """Закешированная лента подписок не показывается другому"""
+        follower = User.objects.create_user(username='follower')
+        stranger = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=follower, author=self.user)
+        follower_client = Client()
+        follower_client.force_login(follower)
+        stranger_client = Client()
+        stranger_client.force_login(stranger)
+        response = follower_client.get(reverse('follow_index'))
+        self.assertContains(response, 'test_post')
+        response = stranger_client.get(reverse('follow_index'))
+        self.assertNotContains(response, 'test_post')
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='test_group', slug='test')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def create_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                text=f'test_post_{number}',
+                author=self.author,
+                group=self.group,
+            )
+            post.comments.create(author=self.reader, text='comment')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': 'test'}),
+            reverse('profile', kwargs={'username': 'test_user'}),
+            reverse('follow_index'),
+        )
+        self.create_posts(1)
+        few = {url: self.count_queries(url) for url in urls}
+        self.create_posts(9)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), few[url])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='text', author=cls.author)
+        cls.post_url = reverse('post', kwargs={
+            'username': 'author', 'post_id': cls.post.id})
+        cls.profile_url = reverse('profile', kwargs={'username': 'author'})
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, queries
+
+    def test_unchanged_pages_answer_304(self):
+        """Неизменные страницы отвечают 304 без основных запросов"""
+        for url in (reverse('index'), reverse('follow_index'),
+                    self.profile_url, self.post_url):
+            with self.subTest(url=url):
+                response, queries = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(any('"posts_comment"' in query['sql']
+                                     for query in queries))
+                self.assertFalse(any('LIMIT 11' in query['sql']
+                                     for query in queries))
+
+    def test_comment_changes_post_validators(self):
+        """Новый комментарий меняет ETag и Last-Modified поста"""
+        before = self.client.get(self.post_url)
+        Comment.objects.create(post=self.post, author=self.reader, text='c')
+        response = self.client.get(
+            self.post_url, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], before['ETag'])
+        self.client.logout()
+        self.assertIn('Last-Modified', self.client.get(self.post_url))
+
+    def test_new_csrf_token_changes_post_etag(self):
+        """После нового входа страница поста с формой отдаётся заново"""
+        response = self.client.get(self.post_url)
+        self.assertNotIn('Last-Modified', response)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'rotated'
+        response = self.client.get(
+            self.post_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag профиля"""
+        etag = self.client.get(self.profile_url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(self.profile_url,
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_differs_per_viewer(self):
+        """Разные зрители получают разные ETag"""
+        etag = self.client.get(reverse('index'))['ETag']
+        self.client.logout()
+        self.assertNotEqual(self.client.get(reverse('index'))['ETag'], etag)
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='text', author=cls.author)
+        cls.post_url = reverse('post', kwargs={
+            'username': 'author', 'post_id': cls.post.id})
+        cls.comments_url = reverse('post_comments', kwargs={
+            'username': 'author', 'post_id': cls.post.id})
+
+    def add_comments(self, count):
+        start = Comment.objects.count()
+        for number in range(start, start + count):
+            user = User.objects.create_user(username=f'reader_{number}')
+            Comment.objects.create(post=self.post, author=user,
+                                   text=f'comment_{number}')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_post_queries_do_not_depend_on_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев"""
+        self.add_comments(1)
+        few = self.count_queries(self.post_url)
+        self.add_comments(30)
+        self.assertEqual(self.count_queries(self.post_url), few)
+
+    def test_older_comments_load_by_fragment(self):
+        """Старые комментарии догружаются фрагментом по курсору"""
+        self.add_comments(25)
+        page = self.client.get(self.post_url).context['comment_page']
+        self.assertEqual(len(page), 20)
+        self.assertEqual(page[0].text, 'comment_24')
+        response = self.client.get(
+            self.comments_url, {'cursor': page.next_cursor})
+        older = response.context['comment_page']
+        self.assertEqual([comment.text for comment in older],
+                         [f'comment_{number}' for number in range(4, -1, -1)])
+        self.assertIsNone(older.next_cursor)
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, '<script')
+
+    def test_fragment_checks_author(self):
+        """Фрагмент комментариев чужого поста не отдаётся"""
+        User.objects.create_user(username='anyone')
+        response = self.client.get(reverse('post_comments', kwargs={
+            'username': 'anyone', 'post_id': self.post.id}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_script_loaded_by_page(self):
+        """Скрипт подгрузки подключает страница поста, а не фрагмент"""
+        self.assertContains(self.client.get(self.post_url),
+                            'src="/static/posts/comments.js"')
+
+    def test_comment_form_posts_to_post(self):
+        """Форма комментария отправляется на адрес комментируемого поста"""
+        self.client.force_login(self.author)
+        response = self.client.get(self.post_url)
+        self.assertContains(response, 'action="{}"'.format(reverse(
+            'add_comment', kwargs={'username': 'author',
+                                   'post_id': self.post.id})))
@@ -0,0 +1,133 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+PENDING_TIMEOUT = 60
+
+_executor = None
+
+
+def _options():
+    # Повторяет сборку опций в sorl ThumbnailBackend.get_thumbnail, чтобы
+    # имя миниатюры совпало с тем, что создаст sorl.
+    backend = default.backend
+    options = dict(OPTIONS)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(name):
+    source = ImageFile(name)
+    name = default.backend._get_thumbnail_filename(
+        source, GEOMETRY, _options()
+    )
+    return ImageFile(name, default.storage)
+
+
+def ready(image):
+    """Готовая миниатюра из key-value store или None; файлы не читаются."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image.name))
+
+
+def prefetch(posts):
+    """Достаёт готовые миниатюры всей страницы одним get_many.
+
+    Вызывается из cards.render для карточек, которых нет в кеше.
+    Результат запоминается на самих постах в ``prefetched_thumbnail``,
+    откуда его берёт тег ready_thumbnail.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBStore):
+        return
+    keys = {
+        post.pk: add_prefix(thumbnail_file(post.image.name).key)
+        for post in posts if post.image
+    }
+    values = kvstore.cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in values]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # Как и sorl, запоминаем отсутствие записи, чтобы не ходить в БД.
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(fetched,
+                               thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    for post in posts:
+        value = values.get(keys.get(post.pk))
+        if value and value != EMPTY_VALUE:
+            post.prefetched_thumbnail = deserialize_image_file(value)
+        else:
+            post.prefetched_thumbnail = None
+
+
+def generate(name):
+    default.backend.get_thumbnail(name, GEOMETRY, **OPTIONS)
+    cache.delete(_pending_key(name))
+    # Закешированные ленты с заглушкой вместо картинки устарели.
+    versions.bump_feed()
+
+
+def _pending_key(name):
+    return f'thumbnail:pending:{name}'
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def _report(future):
+    if future.exception() is not None:
+        logger.error('Thumbnail generation failed',
+                     exc_info=future.exception())
+
+
+def submit(name):
+    if not cache.add(_pending_key(name), True, PENDING_TIMEOUT):
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        try:
+            generate(name)
+        except Exception:
+            logger.exception('Thumbnail generation failed')
+        return
+    _pool().submit(generate, name).add_done_callback(_report)
+
+
+def schedule(post):
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: submit(name))
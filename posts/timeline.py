@@ -0,0 +1,135 @@
+"""Материализованная лента подписок: одна строка на пару (подписчик, пост).
+
+Посты обычных авторов раскладываются по лентам подписчиков при создании
+(fan-out on write). У авторов с числом подписчиков больше FANOUT_LIMIT
+раскладка пропускается, и их посты подмешиваются в ленту при чтении
+(fan-out on read), так что один пост не порождает миллионы вставок.
+Такой автор получает отметку UserStats.pull_on_read и остаётся в чтении
+навсегда: после отписок его неразложенные посты иначе пропали бы из лент.
+Чтение ленты ничего не пишет в базу.
+"""
+import heapq
+
+from django.db.models import F
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+FANOUT_LIMIT = 5000
+BACKFILL_LIMIT = 1000
+BATCH_SIZE = 500
+
+
+def _insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def mark_pulled(author_ids):
+    """Отмечает авторов, чьи посты читаются в обход материализованных лент."""
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk, pull_on_read=True) for pk in author_ids],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.filter(
+        user_id__in=author_ids, pull_on_read=False).update(pull_on_read=True)
+
+
+def fan_out(post):
+    popular = UserStats.objects.filter(
+        user_id=post.author_id, follower_count__gt=FANOUT_LIMIT
+    ).values_list('pull_on_read', flat=True).first()
+    if popular is not None:
+        if not popular:
+            mark_pulled([post.author_id])
+        return
+    followers = Follow.objects.filter(author_id=post.author_id)
+    _insert([
+        TimelineEntry(user_id=user_id, post_id=post.id,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers.values_list('user_id', flat=True)
+    ])
+
+
+def backfill(user_id, author_id):
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')[:BACKFILL_LIMIT]
+    _insert([
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    ])
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def popular_authors(user):
+    return list(Follow.objects.filter(
+        user=user, author__stats__pull_on_read=True,
+    ).values_list('author_id', flat=True))
+
+
+class Merged:
+    """Несколько выборок с общим ключом сортировки, слитые в одну.
+
+    Поддерживает ровно то, что нужно CursorPaginator: order_by, filter,
+    reverse и срез; каждая выборка читается по своему индексу не дальше
+    конца среза, а строки сливаются в памяти.
+    """
+
+    def __init__(self, *querysets, ordering=(), descending=False):
+        self.querysets = querysets
+        self.ordering = ordering
+        self.descending = descending
+        self.model = querysets[0].model
+        self.query = querysets[0].query
+
+    def _apply(self, method, *args, **kwargs):
+        return Merged(*(getattr(queryset, method)(*args, **kwargs)
+                        for queryset in self.querysets),
+                      ordering=self.ordering, descending=self.descending)
+
+    def order_by(self, *fields):
+        merged = self._apply('order_by', *fields)
+        merged.ordering = tuple(field.lstrip('-') for field in fields)
+        merged.descending = fields[0].startswith('-')
+        return merged
+
+    def filter(self, *args, **kwargs):
+        return self._apply('filter', *args, **kwargs)
+
+    def reverse(self):
+        merged = self._apply('reverse')
+        merged.descending = not self.descending
+        return merged
+
+    def _key(self, row):
+        return tuple(getattr(row, field) for field in self.ordering)
+
+    def __getitem__(self, window):
+        rows = heapq.merge(
+            *(list(queryset[:window.stop]) for queryset in self.querysets),
+            key=self._key, reverse=self.descending,
+        )
+        return list(rows)[window]
+
+
+def feed(user):
+    """Лента пользователя с ключом (pub_date, post_id) у каждой строки."""
+    entries = TimelineEntry.objects.filter(user=user)
+    popular = popular_authors(user)
+    if not popular:
+        return entries
+    # Разложенные раньше посты популярных авторов берутся из одного места.
+    pulled = Post.objects.filter(author_id__in=popular).annotate(
+        post_id=F('id')).only('pub_date')
+    return Merged(entries.exclude(author_id__in=popular), pulled)
+
+
+def posts(entries):
+    post_ids = [entry.post_id for entry in entries]
+    found = Post.objects.feed().in_bulk(post_ids)
+    return [found[post_id] for post_id in post_ids if post_id in found]
@@ -1,11 +1,32 @@
-from django.urls import path
+from django.urls import include, path, register_converter
 
-from . import views
+from . import api, feeds, views
+
+register_converter(feeds.FormatConverter, 'feed_format')
+
+api_urlpatterns = [
+    path('posts/', api.posts, name='api_posts'),
+    path('posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path('posts/<int:post_id>/comments/', api.post_comments,
+         name='api_post_comments'),
+    path('groups/', api.groups, name='api_groups'),
+    path('groups/<slug:slug>/', api.group_detail, name='api_group'),
+    path('profiles/<str:username>/', api.profile, name='api_profile'),
+]
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('api/v1/', include(api_urlpatterns)),
+    path('feeds/<feed_format:format>/', views.feed, name='feed'),
+    path('feeds/<feed_format:format>/group/<slug:slug>/', views.feed,
+         name='group_feed'),
+    path('feeds/<feed_format:format>/author/<str:username>/', views.feed,
+         name='author_feed'),
     path('follow/', views.follow_index, name='follow_index'),
     path('new/', views.new_post, name='new_post'),
+    # Под префиксами, чтобы не занимать адреса профилей search и export.
+    path('posts/search/', views.search, name='search'),
+    path('settings/export/', views.export_data, name='export_data'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('<str:username>/', views.profile, name='profile'),
     path(
@@ -19,6 +40,11 @@ urlpatterns = [
         name='profile_unfollow'
     ),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path(
+        '<str:username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         '<str:username>/<int:post_id>/edit/',
         views.post_edit,
@@ -0,0 +1,100 @@
+import logging
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+FEED_KEY = 'feed:generation'
+# Поколение всех лент-подписок (RSS, Atom, JSON Feed); его поднимают
+# массовые загрузки, минуя сигналы.
+SCOPES_KEY = 'feed:scopes'
+# Версия поискового индекса: её двигают только изменения самих постов,
+# а не комментарии и миниатюры.
+SEARCH_KEY = 'feed:search'
+
+
+def _follow_key(user_id):
+    return f'feed:follow:{user_id}'
+
+
+def _scope_key(name):
+    return f'feed:scope:{name}'
+
+
+def _initial():
+    # Начальное значение растёт со временем, поэтому после вытеснения
+    # ключа старые фрагменты с прежними версиями не оживут.
+    return int(time.time() * 1000)
+
+
+def _get(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial(), None)
+        version = cache.get(key)
+    if version is None:
+        # Общий кеш недоступен: свежая версия на каждый запрос просто
+        # отключает кеширование фрагментов, пока он не вернётся.
+        logger.warning('Cache version unavailable: %s', key)
+        version = _initial()
+    return version
+
+
+def _incr(key):
+    # В memcached incr и add атомарны, поэтому параллельные подъёмы не
+    # теряются: если ключ вытеснен и его успел завести соседний процесс,
+    # прибавляем к его значению. Файловый кеш может слить два подъёма
+    # в один, но версия всё равно сменится.
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, _initial(), None):
+            cache.incr(key)
+
+
+def _bump(key):
+    # Версии поднимают сигналы сохранения моделей: недоступный кеш
+    # должен стоить одного подъёма, а не самой записи.
+    try:
+        _incr(key)
+    except Exception:
+        logger.exception('Cache version bump lost: %s', key)
+
+
+def feed():
+    return _get(FEED_KEY)
+
+
+def follow(user_id):
+    return _get(_follow_key(user_id))
+
+
+def bump_feed():
+    _bump(FEED_KEY)
+
+
+def bump_follow(user_id):
+    _bump(_follow_key(user_id))
+
+
+def search():
+    return _get(SEARCH_KEY)
+
+
+def bump_search():
+    _bump(SEARCH_KEY)
+
+
+def scope(name):
+    """Версия постов одной ленты: site, group:<id> или author:<id>."""
+    return f'{_get(SCOPES_KEY)}.{_get(_scope_key(name))}'
+
+
+def bump_scopes(*names):
+    for name in names:
+        _bump(_scope_key(name))
+
+
+def bump_all_scopes():
+    _bump(SCOPES_KEY)
@@ -1,76 +1,156 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
 
+from yatube.sqlite import immediate
+from . import conditions, exporting, feeds, thumbnails, timeline, versions
 from .forms import CommentForm, PostForm
-from .models import Group, Follow, Post, User
+from .models import Group, Follow, Post, User, UserStats
+from .paginator import CursorPaginator
+from .search import MAX_RESULTS, ranked_ids
 
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
 
+
+def paginate(request, queryset, per_page=POSTS_PER_PAGE, **kwargs):
+    paginator = CursorPaginator(queryset, per_page, **kwargs)
+    return paginator.get_page(
+        request.GET.get('page'),
+        request.GET.get('cursor'),
+    )
+
+
+@condition(etag_func=conditions.feed_etag)
 def index(request):
-    lastest = Post.objects.all()
-    paginator = Paginator(lastest, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page})
+    lastest = Post.objects.feed()
+    page = paginate(request, lastest)
+    context = {
+        'page': page,
+        'feed_version': versions.feed(),
+    }
+    return render(request, 'index.html', context)
 
 
+@condition(etag_func=conditions.feed_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.posts.feed()
+    page = paginate(request, posts)
     return render(request, 'group.html', {'group': group, 'page': page})
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = version = None
+    truncated = False
+    if query:
+        # Страницы одной выдачи несут версию, под которой она запомнена.
+        try:
+            version = int(request.GET['v'])
+        except (KeyError, ValueError):
+            version = versions.search()
+        last = MAX_RESULTS // POSTS_PER_PAGE
+        try:
+            number = min(max(int(request.GET.get('page', 1)), 1), last)
+        except ValueError:
+            number = 1
+        start = (number - 1) * POSTS_PER_PAGE
+        ids, more = ranked_ids(
+            Post.objects, query, version, start, start + POSTS_PER_PAGE)
+        if not ids and number > 1:
+            number, start = 1, 0
+            ids, more = ranked_ids(
+                Post.objects, query, version, 0, POSTS_PER_PAGE)
+        truncated = more and number == last
+        found = Post.objects.search(query).in_bulk(ids)
+        # Сколько найдено всего, неизвестно: страниц столько, сколько уже
+        # видно, и ещё одна, если результаты не кончились.
+        known = Paginator(range(start + len(ids) + (more and not truncated)),
+                          POSTS_PER_PAGE)
+        page = Page([found[pk] for pk in ids if pk in found], number, known)
+    return render(request, 'search.html', {
+        'query': query,
+        'page': page,
+        'version': version,
+        'truncated': truncated,
+        'max_results': MAX_RESULTS,
+    })
+
+
+@condition(etag_func=feeds.etag)
+def feed(request, format, slug=None, username=None):
+    return feeds.serve(request, format,
+                       feeds.Scope.for_request(request, slug, username))
+
+
 @login_required
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST' and form.is_valid():
         form = form.save(commit=False)
         form.author = request.user
-        form.save()
+        with immediate():
+            form.save()
+            thumbnails.schedule(form)
         return redirect('index')
     return render(request, 'post_new.html', {'form': form})
 
 
+@condition(etag_func=conditions.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    count_follower = author.follower.count()
-    count_following = author.following.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = UserStats.of(author)
     following = None
     if request.user.is_authenticated:
-        following = author.following.filter(user=request.user)
-    count_posts = posts.count()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+        following = author.following.filter(user=request.user).exists()
+    page = paginate(request, author.posts.feed())
     context = {
         'author': author,
         'page': page,
-        'count': count_posts,
-        'count_follower': count_follower,
-        'count_following': count_following,
+        'count': stats.post_count,
+        'count_follower': stats.following_count,
+        'count_following': stats.follower_count,
         'following': following,
     }
     return render(request, 'profile.html', context)
 
 
+def comment_context(request, post):
+    page = paginate(request, post.comments.select_related('author'),
+                    COMMENTS_PER_PAGE, fields=('created', 'id'))
+    # Страница комментариев — QuerySet с уже прочитанными строками.
+    return {'comment_page': page, 'comments': page.object_list}
+
+
+@condition(etag_func=conditions.post_etag,
+           last_modified_func=conditions.post_last_modified)
 def post_view(request, username, post_id):
     user = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.feed(), id=post_id)
     form = CommentForm()
     context = {
         'author': user,
         'post': post,
         'form': form,
-        'comments': comments,
+        **comment_context(request, post),
     }
     return render(request, 'post.html', context)
 
 
+@condition(etag_func=conditions.post_etag,
+           last_modified_func=conditions.post_last_modified)
+def post_comments(request, username, post_id):
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
+    context = {'post': post, **comment_context(request, post)}
+    return render(request, 'comment_list.html', context)
+
+
 @login_required
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -79,9 +159,10 @@ def add_comment(request, username, post_id):
         form = form.save(commit=False)
         form.author = request.user
         form.post = post
-        form.save()
+        with immediate():
+            form.save()
         return redirect('post', username=username, post_id=post_id)
-    return render(request, 'comment.html', {'form': form})
+    return render(request, 'comment.html', {'form': form, 'post': post})
 
 
 @login_required
@@ -95,19 +176,41 @@ def post_edit(request, username, post_id):
         instance=post
     )
     if request.method == 'POST' and form.is_valid():
-        form.save()
+        with immediate():
+            post = form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
         return redirect('post', username=username, post_id=post.id)
     return render(request, 'post_new.html', {'form': form, 'post': post})
 
 
 @login_required
+@condition(etag_func=conditions.follow_etag)
 def follow_index(request):
     user = request.user
-    following_posts = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(following_posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, "follow.html", {'page': page})
+    page = paginate(request, timeline.feed(user),
+                    fields=('pub_date', 'post_id'))
+    page.object_list = timeline.posts(page.object_list)
+    context = {
+        'page': page,
+        'feed_version': versions.feed(),
+        'follow_version': versions.follow(user.id),
+    }
+    return render(request, "follow.html", context)
+
+
+@login_required
+def export_data(request):
+    user = request.user
+    response = StreamingHttpResponse(
+        exporting.zip_stream(exporting.user_tables(user),
+                             exporting.user_images(user)),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{user.username}.zip"'
+    )
+    return response
 
 
 @login_required
@@ -115,7 +218,8 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if author != user:
-        Follow.objects.get_or_create(user=user, author=author)
+        with immediate():
+            Follow.objects.get_or_create(user=user, author=author)
     return redirect('profile', username=author)
 
 
@@ -124,7 +228,8 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
     if author != user:
-        Follow.objects.filter(user=user).filter(author=author).delete()
+        with immediate():
+            Follow.objects.filter(user=user).filter(author=author).delete()
     return redirect('profile', username=author)
 
 
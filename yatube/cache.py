@@ -0,0 +1,193 @@
+import contextvars
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+_MISSING = object()
+
+# Счётчик попаданий текущего запроса (local, shared, miss); его заводит
+# RequestMetricsMiddleware, без неё счёт не ведётся.
+request_stats = contextvars.ContextVar('cache_request_stats', default=None)
+
+
+def _count(outcome, amount=1):
+    stats = request_stats.get()
+    if stats is not None and amount:
+        stats[outcome] += amount
+
+
+class LocalLRU:
+    """Ограниченное по размеру хранилище процесса с TTL на каждый ключ."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            pickled, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._data[key] = (pickled, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoLevelCache(BaseCache):
+    """Кеш из двух уровней: LRU в памяти процесса и общий для воркеров.
+
+    LOCATION — алиас общего кеша из CACHES (memcached, файлы и т.п.).
+    Чтение идёт через локальный уровень, запись и удаление — в оба, но
+    локальный уровень чистится только в своём процессе: удаление или
+    перезапись ключа в соседнем воркере сюда не доходят, и прежняя
+    локальная копия видна до LOCAL_TIMEOUT секунд. Ключи, для которых
+    это недопустимо, перечисляются префиксами в LOCAL_BYPASS (счётчики
+    версий) и локально не хранятся.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._bypass = tuple(options.get('LOCAL_BYPASS', ()))
+        self._local = LocalLRU(options.get('LOCAL_MAX_ENTRIES', 1000))
+
+    @cached_property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_key(self, key, version):
+        if key.startswith(self._bypass):
+            return None
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _remember(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        if local_key is None:
+            return
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None:
+            timeout = min(timeout - time.time(), self._local_timeout)
+            if timeout <= 0:
+                return
+        else:
+            timeout = self._local_timeout
+        self._local.set(local_key, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            value = self._local.get(local_key)
+            if value is not _MISSING:
+                _count('local')
+                return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            _count('miss')
+            return default
+        _count('shared')
+        self._remember(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        misses = []
+        for key in keys:
+            local_key = self._local_key(key, version)
+            value = _MISSING
+            if local_key is not None:
+                value = self._local.get(local_key)
+            if value is _MISSING:
+                misses.append(key)
+            else:
+                found[key] = value
+        _count('local', len(found))
+        if misses:
+            shared = self.shared.get_many(misses, version=version)
+            for key, value in shared.items():
+                self._remember(self._local_key(key, version), value)
+            found.update(shared)
+            _count('shared', len(shared))
+            _count('miss', len(misses) - len(shared))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(self._local_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(self._local_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(self._local_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self._local.delete(local_key)
+        self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            local_key = self._local_key(key, version)
+            if local_key is not None:
+                self._local.delete(local_key)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None and self._local.get(
+                local_key) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self._local.delete(local_key)
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
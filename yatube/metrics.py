@@ -0,0 +1,151 @@
+"""Метрики запроса: SQL, шаблоны и кеш — в заголовок Server-Timing.
+
+Выключается настройкой REQUEST_METRICS; тогда middleware снимается
+при загрузке и ничего не стоит. С REQUEST_METRICS_LOG каждая метрика
+пишется строкой JSON в лог yatube.metrics. Одинаковый SQL, повторённый
+в запросе REQUEST_METRICS_REPEAT_LIMIT раз и больше (обычно это N+1),
+попадает в лог предупреждением независимо от REQUEST_METRICS_LOG.
+
+Время шаблонов меряет бэкенд DjangoTemplates из этого модуля (его
+указывают в TEMPLATES): он оборачивает отданные им шаблоны, ничего
+не подменяя в самом Django.
+"""
+import contextvars
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends import django
+
+from . import cache
+
+logger = logging.getLogger('yatube.metrics')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.template_time = 0.0
+        self.rendering = False
+        self.cache = Counter()
+
+    def repeated(self):
+        """SQL, выполненный больше одного раза, и сколько раз."""
+        return {sql: count for sql, count in self.statements.items()
+                if count > 1}
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.sql_time += time.perf_counter() - started
+            metrics.statements[sql] += 1
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        # Шаблоны, отрисованные внутри другого, входят в его время.
+        metrics = _current.get()
+        if metrics is None or metrics.rendering:
+            return self.template.render(context, request)
+        metrics.rendering = True
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.rendering = False
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def server_timing(metrics, total):
+    repeated = sum(count - 1 for count in metrics.repeated().values())
+    hits = metrics.cache['local'] + metrics.cache['shared']
+    return ', '.join([
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={metrics.sql_time * 1000:.1f};'
+        f'desc="queries={metrics.queries} repeated={repeated}"',
+        f'tpl;dur={metrics.template_time * 1000:.1f}',
+        f'cache;desc="hits={hits} misses={metrics.cache["miss"]}"',
+    ])
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        cache_token = cache.request_stats.set(metrics.cache)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            cache.request_stats.reset(cache_token)
+            _current.reset(token)
+        total = time.perf_counter() - started
+        response['Server-Timing'] = server_timing(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def log(self, request, response, metrics, total):
+        repeated = metrics.repeated()
+        limit = settings.REQUEST_METRICS_REPEAT_LIMIT
+        suspicious = {sql: count for sql, count in repeated.items()
+                      if count >= limit}
+        if not settings.REQUEST_METRICS_LOG and not suspicious:
+            return
+        match = request.resolver_match
+        line = json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'queries': metrics.queries,
+            'sql_ms': round(metrics.sql_time * 1000, 1),
+            'repeated': [
+                {'sql': sql, 'count': count}
+                for sql, count in Counter(repeated).most_common(3)
+            ],
+            'template_ms': round(metrics.template_time * 1000, 1),
+            'cache': dict(metrics.cache),
+        }, ensure_ascii=False)
+        if suspicious:
+            logger.warning(line)
+        else:
+            logger.info(line)
@@ -0,0 +1,126 @@
+"""Профилирование отдельных запросов по требованию.
+
+Профиль снимается, если запрос несёт подписанный заголовок X-Profile
+(его выдаёт manage.py profile_token) или если сотрудник добавил к адресу
+?profile= . Токен действует PROFILING_TOKEN_MAX_AGE секунд и только
+один раз: его номер запоминается в кеше. Режим sample — выборочный
+профилировщик в отдельном потоке: раз в PROFILING_INTERVAL секунд он
+запоминает стек потока запроса и пишет свёрнутые стеки (формат
+flamegraph.pl и speedscope) в PROFILING_DIR/<id>.folded. Режим cprofile
+пишет статистику cProfile в <id>.prof. Идентификатор — время запроса
+и случайная часть, он возвращается в заголовке X-Profile-Id.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+HEADER = 'HTTP_X_PROFILE'
+SALT = 'yatube.profiling'
+MODES = ('sample', 'cprofile')
+
+# cProfile в одном процессе может работать только один.
+_cprofile_lock = threading.Lock()
+
+
+def make_token(mode='sample'):
+    return signing.dumps({'mode': mode, 'nonce': uuid.uuid4().hex},
+                         salt=SALT)
+
+
+def redeem(token):
+    """Режим из токена или None, если токен чужой, старый или уже погашен."""
+    max_age = settings.PROFILING_TOKEN_MAX_AGE
+    try:
+        payload = signing.loads(token, salt=SALT, max_age=max_age)
+        nonce = payload['nonce']
+    except (signing.BadSignature, TypeError, KeyError):
+        return None
+    if not cache.add(f'profiling:token:{nonce}', True, max_age):
+        return None
+    return payload.get('mode')
+
+
+def requested_mode(request):
+    token = request.META.get(HEADER)
+    if token:
+        mode = redeem(token)
+        if mode is None:
+            return None
+    elif 'profile' in request.GET and request.user.is_staff:
+        mode = request.GET['profile']
+    else:
+        return None
+    return mode if mode in MODES else MODES[0]
+
+
+def frame_name(code):
+    path = '/'.join(code.co_filename.split(os.sep)[-2:])
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'
+
+
+class Sampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f'{stack} {count}\n')
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        request_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex}'
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILING_DIR, request_id)
+        if mode == 'cprofile':
+            if not _cprofile_lock.acquire(blocking=False):
+                return self.get_response(request)
+            try:
+                profile = cProfile.Profile()
+                response = profile.runcall(self.get_response, request)
+                profile.dump_stats(path + '.prof')
+            finally:
+                _cprofile_lock.release()
+        else:
+            with Sampler(settings.PROFILING_INTERVAL) as sampler:
+                response = self.get_response(request)
+            sampler.write(path + '.folded')
+        response['X-Profile-Id'] = request_id
+        return response
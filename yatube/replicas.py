@@ -0,0 +1,74 @@
+"""Чтение из реплик для лент и запись в основную базу.
+
+Middleware включает реплику только для представлений из REPLICA_VIEWS
+и только для безопасных методов. Как только запрос что-то записал,
+его дальнейшие чтения идут в основную базу, а браузер получает куку,
+которая на REPLICA_STICKY_SECONDS оставляет пользователя на основной
+базе: так он видит собственные изменения, пока реплики догоняют.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'primary_db'
+# Сессии и служебные таблицы всегда читаются из основной базы.
+REPLICA_APPS = ('posts', 'auth')
+
+_route = contextvars.ContextVar('db_route', default=None)
+
+
+class Route:
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        route = _route.get()
+        if (route is None or route.replica is None or route.wrote
+                or model._meta.app_label not in REPLICA_APPS):
+            return None
+        return route.replica
+
+    def db_for_write(self, model, **hints):
+        route = _route.get()
+        if route is not None:
+            route.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _route.set(Route())
+        try:
+            response = self.get_response(request)
+            if _route.get().wrote:
+                response.set_cookie(STICKY_COOKIE, '1',
+                                    max_age=settings.REPLICA_STICKY_SECONDS,
+                                    httponly=True)
+        finally:
+            _route.reset(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = f'{view_func.__module__}.{view_func.__name__}'
+        if (request.method in ('GET', 'HEAD')
+                and view in settings.REPLICA_VIEWS
+                and STICKY_COOKIE not in request.COOKIES):
+            _route.get().replica = random.choice(settings.DATABASE_REPLICAS)
@@ -37,7 +37,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'about',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +57,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'yatube.profiling.ProfilingMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -63,7 +66,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR, 'templates/posts', 'templates/users'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,13 +87,73 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# WAL позволяет читать во время записи; synchronous=NORMAL в режиме WAL
+# не теряет целостность, рискуя лишь последними транзакциями при сбое ОС.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт в потоке воркера между запросами.
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+        },
     }
 }
 
+# Реплики только для чтения. Локально это копии базы SQLite, пути к ним
+# перечисляются через запятую в YATUBE_SQLITE_REPLICAS, а обновляет их
+# команда sync_replicas.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_SQLITE_REPLICAS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+REPLICA_VIEWS = [
+    'posts.views.index',
+    'posts.views.group_posts',
+    'posts.views.profile',
+    'posts.views.post_view',
+    'posts.views.post_comments',
+    'posts.views.follow_index',
+    'posts.api.posts',
+    'posts.api.post_detail',
+    'posts.api.post_comments',
+    'posts.api.groups',
+    'posts.api.group_detail',
+    'posts.api.profile',
+]
+# Столько секунд после записи пользователь читает из основной базы.
+REPLICA_STICKY_SECONDS = 10
+
+# Число запросов к БД, время SQL и шаблонов, попадания в кеш — в заголовке
+# Server-Timing; с REQUEST_METRICS_LOG ещё и строкой JSON в лог.
+REQUEST_METRICS = True
+REQUEST_METRICS_LOG = False
+REQUEST_METRICS_REPEAT_LIMIT = 10
+
+# Профили отдельных запросов: заголовок X-Profile (manage.py profile_token)
+# или ?profile= у сотрудников; см. yatube/profiling.py.
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_INTERVAL = 0.005
+PROFILING_TOKEN_MAX_AGE = 5 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -133,6 +197,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Число процессов, готовящих миниатюры после загрузки картинки;
+# 0 — готовить сразу в процессе запроса.
+THUMBNAIL_WORKERS = 2
+
 # Login
 
 LOGIN_URL = '/auth/login/'
@@ -144,8 +212,28 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-#     }
-# }
+# Кеш: LRU в памяти воркера поверх общего для всех процессов уровня.
+# Без настройки общий уровень — файлы в cache/: их видят все процессы
+# машины, включая пул миниатюр, и сервер не нужен. В бою адрес memcached
+# задаётся в YATUBE_MEMCACHED: его incr атомарен, и параллельные подъёмы
+# версий лент (posts/versions.py) не теряются.
+MEMCACHED = os.environ.get('YATUBE_MEMCACHED')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'yatube.cache.TwoLevelCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_TIMEOUT': 5,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_BYPASS': ['feed:', 'timeline:'],
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': MEMCACHED,
+    } if MEMCACHED else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+}
@@ -0,0 +1,27 @@
+"""Настройки для тестов: manage.py test и pytest подключают их сами."""
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES
+
+# Общий уровень кеша в памяти процесса, чтобы прогоны не видели ключей
+# друг друга и не писали в cache/.
+CACHES = {
+    **CACHES,
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+
+# Миниатюры готовятся сразу; пул процессов тесты включают сами.
+THUMBNAIL_WORKERS = 0
+
+# Зеркало тестовой базы; маршрутизацию на него тесты включают сами
+# через DATABASE_REPLICAS.
+DATABASES = {
+    **DATABASES,
+    'replica': {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_REPLICAS = []
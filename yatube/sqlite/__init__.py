@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def immediate(using=None):
+    """atomic() для пишущих транзакций: BEGIN IMMEDIATE вместо BEGIN.
+
+    Блокировка записи берётся в начале транзакции и ждёт busy_timeout,
+    а не падает с "database is locked" при попытке повысить блокировку
+    чтения. Внутри уже открытой транзакции это обычная точка сохранения.
+    """
+    connection = transaction.get_connection(using)
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
@@ -0,0 +1,32 @@
+"""Бэкенд SQLite, настраивающий соединение при открытии.
+
+В OPTIONS понимает ключ ``pragmas`` — словарь PRAGMA, выполняемых
+на каждом новом соединении. Транзакции открываются обычным BEGIN и
+не мешают писателям; пишущие блоки оборачиваются в immediate().
+"""
+from django.db.backends.sqlite3 import base
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Режим BEGIN следующей транзакции; его включает immediate().
+    begin_immediate = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        apply_pragmas(connection, options.get('pragmas', {}))
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(
+            'BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
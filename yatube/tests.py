@@ -0,0 +1,340 @@
+import os
+import pstats
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.template import Context, Template, engines
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+
+from posts import versions
+from posts.models import Post, User
+from yatube.profiling import make_token
+from yatube.replicas import STICKY_COOKIE
+from yatube.sqlite import immediate
+
+
+def repeating_view(request):
+    for post in Post.objects.all():
+        post.author.username
+    cache.get('metrics:missing')
+    page = Template('{% for post in posts %}{{ post.text }}{% endfor %}')
+    return HttpResponse(page.render(Context({
+        'posts': Post.objects.all()})))
+
+
+def rendering_view(request):
+    page = engines['django'].from_string('{{ wait }}')
+    return HttpResponse(page.render({'wait': lambda: time.sleep(0.05)}))
+
+
+def sleeping_view(request):
+    time.sleep(0.05)
+    return HttpResponse()
+
+
+urlpatterns = [
+    path('repeating/', repeating_view),
+    path('rendering/', rendering_view),
+    path('sleeping/', sleeping_view),
+]
+
+CACHES = {
+    'default': {
+        'BACKEND': 'yatube.cache.TwoLevelCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_TIMEOUT': 60,
+            'LOCAL_MAX_ENTRIES': 2,
+            'LOCAL_BYPASS': ['feed:'],
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-level-tests',
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TwoLevelCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['default']
+        self.shared = caches['shared']
+        self.cache.clear()
+
+    def test_write_through_and_local_read(self):
+        """Запись уходит в общий кеш, чтение обслуживает локальный"""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.shared.get('key'), 'value')
+        self.shared.delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_read_through(self):
+        """Промах локального уровня читает общий и запоминает значение"""
+        self.shared.set('key', 'value')
+        self.assertEqual(self.cache.get_many(['key', 'missing']),
+                         {'key': 'value'})
+        self.shared.delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_delete_propagates(self):
+        """Удаление чистит оба уровня"""
+        self.cache.set('key', 'value')
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.shared.get('key'))
+
+    def test_local_level_is_bounded(self):
+        """Локальный уровень вытесняет самые старые ключи"""
+        for key in ('first', 'second', 'third'):
+            self.cache.set(key, key)
+        self.shared.clear()
+        self.assertIsNone(self.cache.get('first'))
+        self.assertEqual(self.cache.get('third'), 'third')
+
+    def test_local_copy_respects_timeout(self):
+        """Локальная копия не переживает таймаут ключа"""
+        self.cache.set('key', 'value', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_bypass_prefix_reads_shared(self):
+        """Счётчики версий всегда читаются из общего кеша"""
+        self.cache.set('feed:generation', 1)
+        self.shared.incr('feed:generation')
+        self.assertEqual(self.cache.get('feed:generation'), 2)
+        self.assertEqual(self.cache.incr('feed:generation'), 3)
+
+    def test_concurrent_bumps_are_not_lost(self):
+        """Параллельные подъёмы версии не теряют приращений"""
+        start = versions.feed()
+
+        def bump():
+            for _ in range(50):
+                versions.bump_feed()
+
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(versions.feed(), start + 400)
+
+
+class UnreachableCache:
+    """Поведение MemcachedCache, когда сервер не отвечает."""
+
+    def get(self, key, default=None):
+        return default
+
+    def add(self, key, value, timeout=None):
+        return False
+
+    def incr(self, key, delta=1):
+        raise ValueError(f"Key '{key}' not found")
+
+
+class CacheOutageTest(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(versions, 'cache', UnreachableCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_writes_survive_cache_outage(self):
+        """Без общего кеша запись проходит, теряется только подъём версии"""
+        author = User.objects.create_user(username='author')
+        with self.assertLogs('posts.versions', 'ERROR'):
+            Post.objects.create(text='test_post', author=author)
+        self.assertTrue(Post.objects.filter(author=author).exists())
+
+    def test_versions_without_cache(self):
+        """Без общего кеша версия всё равно есть"""
+        with self.assertLogs('posts.versions', 'WARNING'):
+            self.assertIsInstance(versions.feed(), int)
+
+
+class SQLiteBackendTest(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """Настройки из OPTIONS применяются к каждому соединению"""
+        connection.close()
+        pragmas = settings.DATABASES['default']['OPTIONS']['pragmas']
+        self.assertEqual(self.pragma('busy_timeout'), pragmas['busy_timeout'])
+        self.assertEqual(self.pragma('cache_size'), pragmas['cache_size'])
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def test_atomic_reads_without_write_lock(self):
+        """atomic() начинает обычную транзакцию, не блокируя писателей"""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN')
+
+    def test_immediate_takes_write_lock_up_front(self):
+        """immediate() сразу начинает транзакцию в режиме IMMEDIATE"""
+        with CaptureQueriesContext(connection) as queries:
+            with immediate():
+                with immediate():
+                    pass
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+        self.assertTrue(queries[1]['sql'].startswith('SAVEPOINT'))
+        self.assertEqual(queries[-1]['sql'], 'BEGIN')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        Post.objects.create(text='text', author=self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def post_reads(self, url, method='get', data=None):
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connection) as primary:
+            getattr(self.client, method)(url, data)
+        return [
+            sum('FROM "posts_post"' in query['sql'] for query in queries)
+            for queries in (primary, replica)
+        ]
+
+    def test_feed_reads_from_replica(self):
+        """Лента читается из реплики, сессия — из основной базы"""
+        primary, replica = self.post_reads(reverse('index'))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_other_views_read_from_primary(self):
+        """Представления вне REPLICA_VIEWS реплику не используют"""
+        post = Post.objects.get()
+        primary, replica = self.post_reads(reverse('post_edit', kwargs={
+            'username': 'reader', 'post_id': post.id}))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_reads_stick_to_primary_after_write(self):
+        """После записи пользователь какое-то время читает основную базу"""
+        response = self.client.post(reverse('new_post'), {'text': 'new'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        primary, replica = self.post_reads(reverse('index'))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+
+@override_settings(ROOT_URLCONF='yatube.tests')
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        for name in ('first', 'second', 'third'):
+            user = User.objects.create_user(username=name)
+            Post.objects.create(text=name, author=user)
+
+    def timing(self, url='/repeating/'):
+        response = self.client.get(url)
+        return dict(
+            part.strip().split(';', 1)
+            for part in response['Server-Timing'].split(',')
+        )
+
+    def test_server_timing_header(self):
+        """Метрики запроса отдаются в заголовке Server-Timing"""
+        timing = self.timing()
+        self.assertEqual(set(timing), {'total', 'db', 'tpl', 'cache'})
+        self.assertIn('desc="queries=5 repeated=3"', timing['db'])
+        self.assertIn('desc="hits=0 misses=1"', timing['cache'])
+
+    def test_template_time(self):
+        """Время шаблонов меряется без подмены Template.render"""
+        timing = self.timing('/rendering/')
+        self.assertGreaterEqual(float(timing['tpl'].split('=')[1]), 50)
+        self.assertEqual(Template.render.__module__, 'django.template.base')
+
+    @override_settings(REQUEST_METRICS_REPEAT_LIMIT=3)
+    def test_repeated_queries_logged(self):
+        """Повторяющийся SQL (N+1) попадает в лог предупреждением"""
+        with self.assertLogs('yatube.metrics', 'WARNING') as logs:
+            self.client.get('/repeating/')
+        self.assertIn('"queries": 5', logs.output[0])
+        self.assertIn('auth_user', logs.output[0])
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled(self):
+        """Выключенные метрики снимают middleware целиком"""
+        response = self.client.get('/repeating/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(ROOT_URLCONF='yatube.tests')
+class ProfilingTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings = override_settings(
+            PROFILING_DIR=self.directory.name, PROFILING_INTERVAL=0.001)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.user = User.objects.create_user(username='staff', is_staff=True)
+
+    def test_signed_header_writes_folded_stacks(self):
+        """Подписанный заголовок снимает профиль в свёрнутые стеки"""
+        response = self.client.get('/sleeping/',
+                                   HTTP_X_PROFILE=make_token(),
+                                   HTTP_X_REQUEST_ID='../slow-request')
+        profile_id = response['X-Profile-Id']
+        self.assertNotIn('slow-request', profile_id)
+        self.assertEqual(os.listdir(self.directory.name),
+                         [profile_id + '.folded'])
+        with open(os.path.join(self.directory.name,
+                               profile_id + '.folded')) as folded:
+            stack, count = folded.readline().rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn(';sleeping_view (yatube/tests.py:', stack)
+
+    def test_token_is_single_use(self):
+        """Токен профилирования срабатывает только один раз"""
+        token = make_token()
+        first = self.client.get('/sleeping/', HTTP_X_PROFILE=token)
+        second = self.client.get('/sleeping/', HTTP_X_PROFILE=token)
+        self.assertTrue(first.has_header('X-Profile-Id'))
+        self.assertFalse(second.has_header('X-Profile-Id'))
+
+    def test_token_expires(self):
+        """Токен старше PROFILING_TOKEN_MAX_AGE отвергается"""
+        token = make_token()
+        with override_settings(PROFILING_TOKEN_MAX_AGE=-1):
+            response = self.client.get('/sleeping/', HTTP_X_PROFILE=token)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+
+    def test_staff_query_parameter_cprofile(self):
+        """Сотрудник включает cProfile параметром ?profile="""
+        self.client.force_login(self.user)
+        response = self.client.get('/sleeping/', {'profile': 'cprofile'})
+        path = os.path.join(self.directory.name,
+                            response['X-Profile-Id'] + '.prof')
+        self.assertIn('sleeping_view', str(pstats.Stats(path).stats))
+
+    def test_not_profiled_without_permission(self):
+        """Без подписи и прав сотрудника профиль не снимается"""
+        self.user.is_staff = False
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get('/sleeping/', {'profile': ''},
+                                   HTTP_X_PROFILE='forged')
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(os.listdir(self.directory.name), [])